@@ -0,0 +1,75 @@
+"""
+Асинхронные обертки для читающих эндпоинтов.
+
+Под ASGI Django 3.2 выполняет синхронные вьюхи через
+sync_to_async(thread_sensitive=True), то есть все запросы процесса
+по очереди в одном потоке: одна медленная выгрузка держит остальные.
+Обертка запускает GET/HEAD/OPTIONS в пуле из ASYNC_VIEW_THREADS
+потоков, а изменяющие запросы оставляет в основном потоке, как было.
+
+У каждого потока пула свое постоянное соединение с БД, так что процесс
+держит до ASYNC_VIEW_THREADS + 1 соединений.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db import request_health_checks
+
+ASYNC_ROUTES = (
+    "recipes-list",
+    "recipes-detail",
+    "tags-list",
+    "tags-detail",
+    "ingredient-list",
+    "ingredient-detail",
+    "users-subscriptions",
+    "recipes-download-shopping-cart",
+)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix="async-view",
+)
+
+
+def run_in_thread(view, request, *args, **kwargs):
+    """
+    Выполняет вьюху в потоке пула. Соединения с БД в этих потоках
+    не обслуживаются сигналами request_started и request_finished,
+    поэтому проверяются и закрываются здесь.
+    """
+    close_old_connections()
+    request_health_checks()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Асинхронная версия синхронной вьюхи."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await sync_to_async(
+                run_in_thread, thread_sensitive=False, executor=executor
+            )(view, request, *args, **kwargs)
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    return wrapper
+
+
+def make_async(urlpatterns, names=ASYNC_ROUTES):
+    """Подменяет вьюхи маршрутов из names асинхронными обертками."""
+    for pattern in urlpatterns:
+        if getattr(pattern, "name", None) in names:
+            pattern.callback = async_view(pattern.callback)
+    return urlpatterns
@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+GENERATION_KEY = "token_cache:{}:generation"
+
+
+class TokenCache:
+    """
+    Ограниченный LRU-кэш token -> (generation, user, token)
+    со временем жизни записей. Хранится в памяти процесса.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def purge(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, "TOKEN_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "TOKEN_CACHE_TTL", 60),
+)
+
+
+def get_generation(key):
+    """
+    Поколение токена в общем кэше. Запись в кэше процесса действительна,
+    пока поколение не изменилось, — так отзыв токена виден всем воркерам.
+    """
+    return cache.get_or_set(
+        GENERATION_KEY.format(key), uuid.uuid4().hex, timeout=None
+    )
+
+
+def revoke(key):
+    """
+    Отзывает закэшированные проверки токена во всех процессах.
+    Поколение случайное, а не счетчик: после вытеснения ключа
+    из общего кэша счетчик начался бы заново и мог бы совпасть
+    со старой записью.
+    """
+    cache.set(GENERATION_KEY.format(key), uuid.uuid4().hex, timeout=None)
+    token_cache.purge(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе для недавно проверенных токенов.
+    Токен отзывается при его удалении и при любом сохранении
+    пользователя (смена пароля, деактивация).
+    """
+
+    def authenticate_credentials(self, key):
+        # Поколение читается до проверки в базе: отзыв, случившийся
+        # во время проверки, сделает новую запись недействительной.
+        generation = get_generation(key)
+        cached = token_cache.get(key)
+        if cached is None or cached[0] != generation:
+            user, token = super().authenticate_credentials(key)
+            cached = (generation, user, token)
+            token_cache.set(key, cached)
+        _, user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,70 @@
+import hashlib
+from calendar import timegm
+from functools import partial
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, get_response, etag, last_modified=None):
+    """
+    Отвечает 304 без вызова get_response, если клиентская копия
+    актуальна, иначе добавляет ETag и Last-Modified к ответу.
+    """
+    timestamp = None
+    if last_modified is not None:
+        timestamp = timegm(last_modified.utctimetuple())
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+    patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+class CatalogConditionalGetMixin:
+    """
+    Условный GET для справочников (теги, ингредиенты).
+    Версия справочника — число записей и последнее изменение,
+    считается одним агрегирующим запросом.
+    """
+
+    def get_catalog_state(self):
+        state = self.get_queryset().order_by().aggregate(
+            count=Count("pk"), last_modified=Max("updated_at")
+        )
+        etag = make_etag(state["count"], state["last_modified"])
+        return etag, state["last_modified"]
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_catalog_state()
+        self.response_etag = etag
+        return conditional_response(
+            request,
+            partial(super().list, request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.get_catalog_state()
+        self.response_etag = etag
+        return conditional_response(
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
@@ -0,0 +1,168 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeIngredient
+
+LOAD_BATCH_SIZE = 10000
+COOKABLE_LIMIT = 20
+COOKABLE_MAX_INGREDIENTS = 100
+
+
+def with_value(values, value):
+    """Копия отсортированного массива с добавленным value."""
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        return values
+    return values[:position] + array("q", (value,)) + values[position:]
+
+
+def without_value(values, value):
+    """Копия отсортированного массива без value."""
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        return values
+    return values[:position] + values[position + 1:]
+
+
+class CookableIndex:
+    """
+    Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов
+    (array('q')), для каждого рецепта — его ингредиенты. Изменения
+    подтягиваются по Recipe.updated_at не чаще refresh_interval секунд.
+    Удаленные рецепты убираются через discard(), когда их не находит
+    вьюсет, и при полной перезагрузке по истечении ttl.
+
+    search() читает индекс без блокировки, поэтому массивы не меняются
+    на месте: запись собирает новый массив и подменяет ссылку в словаре.
+    """
+
+    def __init__(self, refresh_interval=5, ttl=3600, overlap=60):
+        self._lock = threading.Lock()
+        self._refresh_interval = refresh_interval
+        self._ttl = ttl
+        self._overlap = timedelta(seconds=overlap)
+        self._loaded_at = None
+        self._checked_at = 0
+        self._watermark = None
+        self._postings = {}
+        self._recipes = {}
+
+    def _set_recipe(self, recipe_id, ingredient_ids):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            postings = without_value(self._postings[ingredient_id], recipe_id)
+            if postings:
+                self._postings[ingredient_id] = postings
+            else:
+                del self._postings[ingredient_id]
+        if not ingredient_ids:
+            return
+        for ingredient_id in ingredient_ids:
+            self._postings[ingredient_id] = with_value(
+                self._postings.get(ingredient_id, array("q")), recipe_id
+            )
+        self._recipes[recipe_id] = array("q", sorted(ingredient_ids))
+
+    def _load(self, started):
+        recipes = defaultdict(set)
+        rows = RecipeIngredient.objects.order_by().values_list(
+            "recipe_id", "ingredient_id"
+        )
+        for recipe_id, ingredient_id in rows.iterator(LOAD_BATCH_SIZE):
+            recipes[recipe_id].add(ingredient_id)
+
+        postings = defaultdict(list)
+        for recipe_id in sorted(recipes):
+            for ingredient_id in recipes[recipe_id]:
+                postings[ingredient_id].append(recipe_id)
+        self._postings = {
+            ingredient_id: array("q", recipe_ids)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self._recipes = {
+            recipe_id: array("q", sorted(ingredient_ids))
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+        self._loaded_at = time.monotonic()
+        self._watermark = started - self._overlap
+
+    def _apply_changes(self, started):
+        """
+        Перечитывает рецепты, измененные после watermark.
+        Окно перекрывается на overlap, чтобы не пропустить
+        транзакции, зафиксированные с опозданием.
+        """
+        changed = list(Recipe.objects.filter(
+            updated_at__gte=self._watermark
+        ).values_list("pk", flat=True))
+        if changed:
+            recipes = {recipe_id: set() for recipe_id in changed}
+            rows = RecipeIngredient.objects.filter(
+                recipe_id__in=changed
+            ).values_list("recipe_id", "ingredient_id")
+            for recipe_id, ingredient_id in rows:
+                recipes[recipe_id].add(ingredient_id)
+            for recipe_id, ingredient_ids in recipes.items():
+                self._set_recipe(recipe_id, ingredient_ids)
+        self._watermark = started - self._overlap
+
+    def refresh(self):
+        if time.monotonic() - self._checked_at < self._refresh_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self._refresh_interval:
+                return
+            started = timezone.now()
+            if (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at >= self._ttl
+            ):
+                self._load(started)
+            else:
+                self._apply_changes(started)
+            self._checked_at = time.monotonic()
+
+    def search(self, ingredient_ids, limit, min_coverage=0.0):
+        """
+        Рецепты, отсортированные по доле ингредиентов, которые есть
+        у пользователя. Возвращает список (recipe_id, покрытие).
+        """
+        self.refresh()
+        postings = self._postings
+        matches = Counter(chain.from_iterable(
+            postings.get(ingredient_id, ()) for ingredient_id in
+            set(ingredient_ids)
+        ))
+        recipes = self._recipes
+        scored = []
+        for recipe_id, count in matches.items():
+            total = len(recipes.get(recipe_id, ()))
+            if total:
+                scored.append((count / total, count, recipe_id))
+        return [
+            (recipe_id, coverage)
+            for coverage, _, recipe_id in heapq.nlargest(limit, scored)
+            if coverage >= min_coverage
+        ]
+
+    def discard(self, recipe_ids):
+        """Убирает из индекса рецепты, которых больше нет в базе."""
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._set_recipe(recipe_id, ())
+
+
+cookable_index = CookableIndex(
+    refresh_interval=getattr(settings, "COOKABLE_INDEX_REFRESH", 5),
+    ttl=getattr(settings, "COOKABLE_INDEX_TTL", 3600),
+)
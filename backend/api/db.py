@@ -0,0 +1,39 @@
+from django.db import connections
+
+
+def checked_ensure_connection(connection, ensure_connection):
+    """
+    ensure_connection, который при первом использовании соединения
+    после request_health_checks проверяет его и закрывает неотвечающее,
+    чтобы запрос открыл новое вместо ошибки.
+    """
+    def wrapper():
+        if connection.health_check_pending:
+            connection.health_check_pending = False
+            if (
+                connection.connection is not None
+                and not connection.in_atomic_block
+                and not connection.is_usable()
+            ):
+                connection.close()
+        ensure_connection()
+
+    return wrapper
+
+
+def request_health_checks():
+    """
+    Помечает постоянные соединения баз с CONN_HEALTH_CHECKS для проверки
+    (перезапуск PostgreSQL, обрыв по таймауту). Проверка выполняется
+    при первом запросе к базе, а не при каждом HTTP-запросе: ответы
+    из кэша и 304 обходятся без лишнего SELECT 1. Аналог одноименной
+    настройки Django 4.1.
+    """
+    for connection in connections.all():
+        if not connection.settings_dict.get("CONN_HEALTH_CHECKS"):
+            continue
+        if not hasattr(connection, "health_check_pending"):
+            connection.ensure_connection = checked_ensure_connection(
+                connection, connection.ensure_connection
+            )
+        connection.health_check_pending = True
@@ -0,0 +1,81 @@
+from django import forms
+from django.db.models import Case, Exists, IntegerField, OuterRef, When
+from django_filters import rest_framework as filters
+
+from recipes.models import Recipe
+from recipes.search import search_recipe_ids
+
+
+class AnyValueMultipleField(forms.MultipleChoiceField):
+    """Множественное поле без фиксированного списка значений."""
+
+    def valid_value(self, value):
+        return True
+
+
+class AnyValueMultipleFilter(filters.MultipleChoiceFilter):
+    field_class = AnyValueMultipleField
+
+
+class RecipeFilter(filters.FilterSet):
+    """
+    Фильтры рецептов.
+    Теги, избранное и список покупок проверяются через EXISTS,
+    поэтому рецепты в выдаче не дублируются.
+    """
+
+    author = filters.NumberFilter(field_name="author_id")
+    tags = AnyValueMultipleFilter(method="filter_tags")
+    is_favorited = filters.BooleanFilter(method="filter_user_flag")
+    is_in_shopping_cart = filters.BooleanFilter(method="filter_user_flag")
+    search = filters.CharFilter(method="filter_search")
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "author", "tags", "is_favorited", "is_in_shopping_cart", "search"
+        )
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef("pk"), tag__slug__in=value
+                )
+            )
+        )
+
+    def filter_user_flag(self, queryset, name, value):
+        """
+        Использует аннотации is_favorited / is_in_shopping_cart
+        из RecipeQuerySet.with_user_flags.
+        """
+        if value is None:
+            return queryset
+        if not self.request.user.is_authenticated:
+            return queryset.none() if value else queryset
+        return queryset.filter(**{name: value})
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск: рецепты упорядочены по релевантности.
+        Без поддержки в базе — поиск подстроки в названии.
+        """
+        if not value.strip():
+            return queryset
+        recipe_ids = search_recipe_ids(value)
+        if recipe_ids is None:
+            return queryset.filter(name__icontains=value)
+        if not recipe_ids:
+            return queryset.none()
+        return queryset.filter(pk__in=recipe_ids).order_by(
+            Case(
+                *(
+                    When(pk=pk, then=position)
+                    for position, pk in enumerate(recipe_ids)
+                ),
+                output_field=IntegerField(),
+            )
+        )
@@ -0,0 +1,137 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Ingredient
+
+VERSION_CACHE_KEY = "ingredient_index_version"
+
+IngredientEntry = namedtuple(
+    "IngredientEntry", ("id", "name", "measurement_unit")
+)
+IndexSnapshot = namedtuple(
+    "IndexSnapshot",
+    (
+        "version", "loaded_at", "keys", "entries", "offsets", "blob",
+        "last_modified",
+    ),
+)
+EMPTY_SNAPSHOT = IndexSnapshot(None, 0, [], [], [], "", None)
+
+
+def normalize(value):
+    """Приводит название к виду для сравнения без учета регистра."""
+    return value.casefold().replace("ё", "е")
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Сначала возвращает совпадения по префиксу (бинарный поиск),
+    затем по подстроке (поиск по склеенной строке ключей).
+    Перестраивается при смене версии в кэше или по истечении TTL.
+
+    Все данные индекса лежат в одном неизменяемом снимке, который
+    перестройка подменяет одним присваиванием: читатели без блокировки
+    не увидят ключи одной версии со смещениями другой.
+    """
+
+    separator = "\x00"
+
+    def __init__(self, ttl=None):
+        self._lock = threading.Lock()
+        self._ttl = ttl
+        self._snapshot = EMPTY_SNAPSHOT
+
+    def _is_fresh(self, snapshot, version):
+        if version != snapshot.version:
+            return False
+        if self._ttl is None:
+            return True
+        return time.monotonic() - snapshot.loaded_at < self._ttl
+
+    def _load(self, version):
+        rows = list(Ingredient.objects.order_by().values_list(
+            "id", "name", "measurement_unit", "updated_at"
+        ))
+        entries = sorted(
+            (IngredientEntry(*row[:3]) for row in rows),
+            key=lambda entry: (normalize(entry.name), entry.measurement_unit),
+        )
+        keys = [normalize(entry.name) for entry in entries]
+        offsets = []
+        position = 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key) + len(self.separator)
+
+        self._snapshot = IndexSnapshot(
+            version=version,
+            loaded_at=time.monotonic(),
+            keys=keys,
+            entries=entries,
+            offsets=offsets,
+            blob=self.separator.join(keys),
+            last_modified=max((row[3] for row in rows), default=None),
+        )
+
+    def refresh(self):
+        """Актуальный снимок индекса."""
+        version = cache.get(VERSION_CACHE_KEY, 0)
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, version):
+            return snapshot
+        with self._lock:
+            if not self._is_fresh(self._snapshot, version):
+                self._load(version)
+            return self._snapshot
+
+    def get_state(self):
+        """Число записей и время последнего изменения каталога."""
+        snapshot = self.refresh()
+        return len(snapshot.entries), snapshot.last_modified
+
+    def search(self, query):
+        snapshot = self.refresh()
+        entries = snapshot.entries
+        needle = normalize(query.strip())
+        if not needle:
+            return list(entries)
+
+        keys = snapshot.keys
+        start = bisect_left(keys, needle)
+        end = bisect_left(
+            keys, needle[:-1] + chr(ord(needle[-1]) + 1), lo=start
+        )
+        result = entries[start:end]
+
+        blob, offsets = snapshot.blob, snapshot.offsets
+        position = blob.find(needle)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            if offsets[index] != position:
+                result.append(entries[index])
+            if index + 1 == len(offsets):
+                break
+            position = blob.find(needle, offsets[index + 1])
+
+        return result
+
+
+def invalidate():
+    """Помечает индексы всех процессов как устаревшие."""
+    if not cache.add(VERSION_CACHE_KEY, 1, timeout=None):
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+ingredient_index = IngredientIndex(
+    ttl=getattr(settings, "INGREDIENT_INDEX_TTL", 300)
+)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from api.views import UsersViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает число запросов и время обработки GET /api/users/me/ "
+        "с TokenAuthentication и CachedTokenAuthentication."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+
+    def run(self, authentication_class, token, requests):
+        view = UsersViewSet.as_view(
+            {"get": "me"}, authentication_classes=[authentication_class]
+        )
+        factory = APIRequestFactory()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(requests):
+                request = factory.get(
+                    "/api/users/me/", HTTP_AUTHORIZATION=f"Token {token.key}"
+                )
+                response = view(request)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - started
+        return len(queries.captured_queries) / requests, elapsed / requests
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username="bench_auth_user",
+                email="bench_auth_user@example.com",
+                password="bench-password",
+            )
+            token = Token.objects.create(user=user)
+            token_cache.clear()
+            for authentication_class in (
+                TokenAuthentication, CachedTokenAuthentication
+            ):
+                queries, latency = self.run(
+                    authentication_class, token, requests
+                )
+                self.stdout.write(
+                    f"{authentication_class.__name__:<28} "
+                    f"запросов к БД на вызов: {queries:.2f}, "
+                    f"среднее время: {latency * 1000:.3f} мс"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+READ_PATHS = (
+    "/api/recipes/",
+    "/api/recipes/{recipe_id}/",
+    "/api/tags/",
+    "/api/ingredients/?name=мо",
+)
+AUTH_READ_PATHS = ("/api/users/subscriptions/",)
+SLOW_PATH = "/api/recipes/download_shopping_cart/?file_format=txt"
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Смешанная нагрузка на запущенный сервер: читающие эндпоинты "
+        "и доля медленных выгрузок списка покупок. Печатает пропускную "
+        "способность и задержки p50/p99 для каждого --url, например "
+        "для gunicorn с SERVER_MODE=wsgi и SERVER_MODE=asgi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", action="append", dest="urls",
+            help="Адрес сервера; можно указать несколько.",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--slow-ratio", type=float, default=0.05,
+            help="Доля выгрузок списка покупок, нужен --token.",
+        )
+        parser.add_argument("--token", help="Токен для авторизованных URL.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def make_plan(self, base_url, options):
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        response = requests.get(
+            f"{base_url}/api/recipes/?limit=1", headers=headers, timeout=10
+        )
+        response.raise_for_status()
+        results = response.json()["results"]
+        if not results:
+            raise CommandError(f"{base_url}: нет рецептов для нагрузки.")
+
+        fast = [
+            path.format(recipe_id=results[0]["id"]) for path in READ_PATHS
+        ]
+        slow_ratio = options["slow_ratio"]
+        if options["token"]:
+            fast.extend(AUTH_READ_PATHS)
+        else:
+            slow_ratio = 0
+        rng = random.Random(options["seed"])
+        plan = [
+            ("slow", SLOW_PATH) if rng.random() < slow_ratio
+            else ("fast", rng.choice(fast))
+            for _ in range(options["requests"])
+        ]
+        return plan, headers
+
+    def run(self, base_url, plan, headers, concurrency):
+        sessions = threading.local()
+
+        def send(item):
+            kind, path = item
+            session = getattr(sessions, "session", None)
+            if session is None:
+                session = sessions.session = requests.Session()
+                session.headers.update(headers)
+            started = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}{path}", timeout=60)
+                response.content
+                status_code = response.status_code
+            except requests.RequestException:
+                status_code = 0
+            return kind, time.perf_counter() - started, status_code
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(send, plan))
+            elapsed = time.perf_counter() - started
+        return results, elapsed
+
+    def report(self, base_url, results, elapsed):
+        errors = Counter(
+            status_code for _, _, status_code in results
+            if status_code != 200
+        )
+        self.stdout.write(
+            f"{base_url}: {len(results) / elapsed:.1f} запр/с, "
+            f"ошибок: {sum(errors.values())} "
+            f"{dict(errors) if errors else ''}"
+        )
+        for kind in ("fast", "slow"):
+            latencies = [
+                latency for result_kind, latency, _ in results
+                if result_kind == kind
+            ]
+            if not latencies:
+                continue
+            self.stdout.write(
+                f"  {kind:<5} n={len(latencies):<6} "
+                f"p50: {percentile(latencies, 0.50) * 1000:.1f} мс, "
+                f"p99: {percentile(latencies, 0.99) * 1000:.1f} мс"
+            )
+
+    def handle(self, *args, **options):
+        for base_url in options["urls"] or ["http://localhost:8000"]:
+            base_url = base_url.rstrip("/")
+            try:
+                plan, headers = self.make_plan(base_url, options)
+            except requests.RequestException as error:
+                raise CommandError(f"{base_url}: {error}")
+            results, elapsed = self.run(
+                base_url, plan, headers, options["concurrency"]
+            )
+            self.report(base_url, results, elapsed)
@@ -0,0 +1,89 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.views import ObtainTokenView
+from users.models import User
+
+EMAIL = "bench_login_user@example.com"
+PASSWORD = "bench-password"
+
+
+def legacy_login(email, password):
+    """Прежний сценарий: поиск по email, authenticate по username."""
+    user = User.objects.get(email=email)
+    user = authenticate(username=user.username, password=password)
+    token, _ = Token.objects.get_or_create(user=user)
+    return token
+
+
+def email_login(email, password):
+    view = ObtainTokenView.as_view()
+    request = APIRequestFactory().post(
+        "/api/auth/token/login/",
+        {"email": email.upper(), "password": password},
+        format="json",
+    )
+    response = view(request)
+    assert response.status_code == 200, response.data
+    return response.data["token"]
+
+
+def timed(login):
+    started = time.perf_counter()
+    try:
+        login(EMAIL, PASSWORD)
+    finally:
+        connection.close()
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет пропускную способность входа по email "
+        "при параллельных запросах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8)
+
+    def count_queries(self, login):
+        with CaptureQueriesContext(connection) as queries:
+            login(EMAIL, PASSWORD)
+        return len(queries.captured_queries)
+
+    def run(self, name, login, logins, threads):
+        queries = self.count_queries(login)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            latencies = sorted(executor.map(
+                lambda _: timed(login), range(logins)
+            ))
+        elapsed = time.perf_counter() - started
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{name:<8} запросов к БД: {queries}, "
+            f"входов/с: {logins / elapsed:.1f}, "
+            f"p50: {statistics.median(latencies) * 1000:.1f} мс, "
+            f"p99: {p99 * 1000:.1f} мс"
+        )
+
+    def handle(self, *args, **options):
+        User.objects.filter(email=EMAIL).delete()
+        User.objects.create_user(
+            username="bench_login_user", email=EMAIL, password=PASSWORD
+        )
+        try:
+            for name, login in (("legacy", legacy_login),
+                                ("email", email_login)):
+                self.run(name, login, options["logins"], options["threads"])
+        finally:
+            User.objects.filter(email=EMAIL).delete()
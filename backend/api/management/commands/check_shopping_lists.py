@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.shopping_list import find_inconsistent, rebuild
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет сохраненные списки покупок с корзинами "
+        "и при --fix пересобирает разошедшиеся."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, nargs="*", dest="user_ids",
+            help="Проверить только указанных пользователей.",
+        )
+        parser.add_argument("--fix", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def iter_batches(self, user_ids, batch_size):
+        if user_ids:
+            yield user_ids
+            return
+        last_pk = User.objects.aggregate(last=Max("pk"))["last"] or 0
+        for start in range(0, last_pk + 1, batch_size):
+            yield list(User.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size
+            ).values_list("pk", flat=True))
+
+    def handle(self, *args, **options):
+        inconsistent = []
+        for user_ids in self.iter_batches(
+            options["user_ids"], options["batch_size"]
+        ):
+            with transaction.atomic():
+                found = find_inconsistent(user_ids)
+                if found and options["fix"]:
+                    rebuild(found)
+            inconsistent.extend(found)
+
+        if not inconsistent:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+            return
+        action = "Пересобрано" if options["fix"] else "Расходится"
+        self.stdout.write(self.style.WARNING(
+            f"{action} списков: {len(inconsistent)} "
+            f"(пользователи: {inconsistent[:20]})."
+        ))
@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ingredient_index, response_cache
+from recipes.models import Ingredient
+
+DEFAULT_PATH = Path(settings.BASE_DIR).parent / "data" / "ingredients.csv"
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.reader(file):
+            if len(row) != 2:
+                continue
+            yield row[0].strip(), row[1].strip()
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in " \t\r\n,":
+        position += 1
+    return position
+
+
+def iter_json_array(file):
+    """
+    Потоково разбирает JSON-массив объектов, не загружая файл целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = chunk.lstrip()
+        if not chunk:
+            break
+    if not buffer.startswith("["):
+        raise CommandError("Ожидается JSON-массив.")
+    buffer = buffer[1:]
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer += chunk
+        position = skip_separators(buffer, 0)
+        while position < len(buffer) and buffer[position] != "]":
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+            position = skip_separators(buffer, position)
+        if buffer[position:position + 1] == "]":
+            return
+        buffer = buffer[position:]
+        if not chunk:
+            raise CommandError("Некорректный JSON-файл.")
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as file:
+        for item in iter_json_array(file):
+            yield item["name"].strip(), item["measurement_unit"].strip()
+
+
+READERS = {
+    "csv": read_csv,
+    "json": read_json,
+}
+
+
+class Command(BaseCommand):
+    help = "Загружает каталог ингредиентов из CSV или JSON файла."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default=str(DEFAULT_PATH),
+            help="Путь к файлу ingredients.csv или ingredients.json.",
+        )
+        parser.add_argument(
+            "--format", choices=READERS.keys(), dest="file_format",
+            help="Формат файла. По умолчанию определяется по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Количество строк в одном INSERT.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден.")
+        file_format = options["file_format"] or path.suffix.lstrip(".")
+        if file_format not in READERS:
+            raise CommandError(f"Неизвестный формат файла: {file_format}")
+        batch_size = options["batch_size"]
+
+        rows = READERS[file_format](path)
+        count_before = Ingredient.objects.count()
+        processed = 0
+        started = time.monotonic()
+        while True:
+            batch = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            processed += len(batch)
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - count_before
+        if created:
+            # bulk_create не отправляет сигналы модели, поэтому индекс
+            # и кэш ответов сбрасываются здесь.
+            ingredient_index.invalidate()
+            response_cache.invalidate("ingredients", "recipes")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано {processed} строк, добавлено {created} "
+            f"за {elapsed:.2f} с ({processed / max(elapsed, 1e-6):.0f} "
+            f"строк/с)."
+        ))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные варианты картинок рецептов, для которых их "
+        "еще нет: созданных до появления вариантов или чья задача "
+        "потерялась при перезапуске воркера. Запускается по расписанию."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=0,
+            help=(
+                "Пропускать рецепты, измененные меньше указанного числа "
+                "минут назад: их картинки еще обрабатывают воркеры."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image="")
+        if options["min_age"]:
+            recipes = recipes.filter(
+                updated_at__lt=timezone.now()
+                - timedelta(minutes=options["min_age"])
+            )
+        recipe_ids = [
+            recipe.pk
+            for recipe in recipes.only("image", "image_variants").iterator()
+            if recipe.image_variants.get("source") != recipe.image.name
+        ]
+        for recipe_id in recipe_ids:
+            process_recipe_image(recipe_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано картинок: {len(recipe_ids)}."
+        ))
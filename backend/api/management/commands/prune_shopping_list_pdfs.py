@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.shopping_pdf import prune_cache
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из SHOPPING_LIST_CACHE_DIR устаревшие PDF списков покупок "
+        "и самые старые файлы сверх лимита размера. Удаленный файл будет "
+        "отрисован заново при следующей загрузке."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=settings.SHOPPING_LIST_CACHE_MAX_AGE_DAYS,
+            help="Максимальный возраст файла в днях.",
+        )
+        parser.add_argument(
+            "--max-size-mb",
+            type=int,
+            default=settings.SHOPPING_LIST_CACHE_MAX_SIZE_MB,
+            help="Максимальный размер кэша в мегабайтах (0 — без лимита).",
+        )
+
+    def handle(self, *args, **options):
+        max_size = options["max_size_mb"] * 1024 * 1024 or None
+        deleted = prune_cache(options["days"] * SECONDS_IN_DAY, max_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено файлов: {deleted}."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет устаревшие отметки об удалении. Клиенты с более старой "
+        "версией получат полный список при следующей синхронизации."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено отметок: {deleted}."
+        ))
@@ -0,0 +1,36 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+from recipes.search import get_backend, index_recipes, remove_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        "Переиндексирует все рецепты для полнотекстового поиска "
+        "и удаляет документы удаленных рецептов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            raise CommandError(
+                "База данных не поддерживает полнотекстовый поиск."
+            )
+        recipe_ids = Recipe.objects.order_by("pk").values_list(
+            "pk", flat=True
+        ).iterator()
+        indexed = 0
+        while True:
+            batch = list(islice(recipe_ids, options["batch_size"]))
+            if not batch:
+                break
+            index_recipes(batch)
+            indexed += len(batch)
+        removed = remove_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f"Проиндексировано рецептов: {indexed}, удалено: {removed}."
+        ))
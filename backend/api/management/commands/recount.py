@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.counters import recount_recipes, recount_users
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает денормализованные счетчики рецептов "
+        "и пользователей пачками по первичному ключу."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def recount_in_batches(self, model, recount, batch_size):
+        last_pk = model.objects.aggregate(last=Max("pk"))["last"] or 0
+        repaired = 0
+        for start in range(0, last_pk + 1, batch_size):
+            with transaction.atomic():
+                repaired += recount(model.objects.filter(
+                    pk__gte=start, pk__lt=start + batch_size
+                ))
+        return repaired
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        recipes = self.recount_in_batches(Recipe, recount_recipes, batch_size)
+        users = self.recount_in_batches(User, recount_users, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлено рецептов: {recipes}, пользователей: {users}."
+        ))
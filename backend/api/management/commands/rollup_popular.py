@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.response_cache import invalidate
+from recipes.popularity import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит новые добавления в избранное и в список покупок "
+        "в дневную статистику рецептов. Запускается периодически."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        processed = rollup(options["batch_size"])
+        if any(processed.values()):
+            invalidate("recipes")
+        self.stdout.write(self.style.SUCCESS(
+            f"Учтено добавлений в избранное: {processed['favorites']}, "
+            f"в список покупок: {processed['shopping_carts']}."
+        ))
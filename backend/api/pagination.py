@@ -0,0 +1,56 @@
+from rest_framework import pagination
+
+
+class IdCursorPagination(pagination.CursorPagination):
+    """
+    Курсорная пагинация по первичному ключу (новые записи первыми).
+    Страница выбирается по индексу, без OFFSET.
+    """
+
+    ordering = "-id"
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def get_window(self, request):
+        """
+        Позиция курсора, направление (True — к более новым записям)
+        и число строк, которые прочитает paginate_queryset.
+        Позволяет заранее ограничить источники страницы этим окном.
+        """
+        cursor = self.decode_cursor(request)
+        size = self.get_page_size(request) + 1
+        if cursor is None:
+            return None, False, size
+        return cursor.position, cursor.reverse, cursor.offset + size
+
+
+class LimitOffsetOrCursorPagination(pagination.LimitOffsetPagination):
+    """
+    Пагинация limit/offset по умолчанию.
+    Переключается на курсорную при ?pagination=cursor
+    или при наличии параметра cursor.
+    """
+
+    mode_query_param = "pagination"
+    cursor_pagination_class = IdCursorPagination
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
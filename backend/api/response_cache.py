@@ -0,0 +1,105 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+KEY_PREFIX = "response_cache"
+HITS_KEY = f"{KEY_PREFIX}:hits"
+MISSES_KEY = f"{KEY_PREFIX}:misses"
+
+
+def version_key(namespace):
+    return f"{KEY_PREFIX}:{namespace}:version"
+
+
+def get_version(namespace):
+    return cache.get_or_set(version_key(namespace), 1, timeout=None)
+
+
+def invalidate(*namespaces):
+    """Делает устаревшими все ответы из указанных пространств."""
+    for namespace in namespaces:
+        key = version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def make_key(namespace, request, etag=None):
+    """
+    Ключ из пути и нормализованной строки запроса:
+    параметры и их значения отсортированы. Если передан etag,
+    он тоже входит в ключ.
+    """
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    ))
+    digest = hashlib.md5(
+        f"{request.path}?{query}#{etag or ''}".encode()
+    ).hexdigest()
+    return f"{KEY_PREFIX}:{namespace}:{get_version(namespace)}:{digest}"
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы list/retrieve для анонимных пользователей.
+    Сбрасывается сменой версии пространства cache_namespace.
+    Если вьюха уже посчитала ETag ответа (response_etag), он входит
+    в ключ: закэшированное тело всегда соответствует отданному ETag.
+    """
+
+    cache_namespace = None
+    response_etag = None
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = make_key(self.cache_namespace, request, self.response_etag)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            return Response(data)
+
+        increment(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
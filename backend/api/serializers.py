@@ -1,8 +1,10 @@
 from django.contrib.auth import authenticate
-from django.shortcuts import get_object_or_404
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, serializers
 from rest_framework.authtoken.models import Token
+from rest_framework.validators import UniqueTogetherValidator
 
 from users.models import (
     User,
@@ -15,16 +17,21 @@ from recipes.models import (
     RecipeIngredient,
     Recipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem,
 )
+from recipes import shopping_list
+from recipes.images import VARIANTS, get_variant
 
 from api.validators import UsernameValidator
 
+BULK_MAX_RECIPES = 100
+
 
 class ShortRecipesSerializer(serializers.ModelSerializer):
-    """Сериалайзер рецептов"""
+    """Сериалайзер рецептов с уменьшенной картинкой."""
 
-    image = Base64ImageField(required=True, use_url=False)
+    image = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -35,6 +42,9 @@ class ShortRecipesSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
 
+    def get_image(self, obj):
+        return get_variant(obj, "thumbnail")
+
 
 class ProfileSerializer(serializers.ModelSerializer):
     """Сериализатор профиля пользователя."""
@@ -69,6 +79,8 @@ class ProfileSerializer(serializers.ModelSerializer):
         model = User
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = self.context.get("request").user
         if user.is_authenticated:
             return user.follower.filter(author=obj).exists()
@@ -80,10 +92,17 @@ class ProfileSerializer(serializers.ModelSerializer):
 
 
 class ProfileWRecipesSerializer(serializers.ModelSerializer):
-    """Сериализатор профиля пользователя."""
+    """
+    Сериализатор профиля автора с превью рецептов.
+    Ожидает аннотацию is_subscribed и предзагруженный
+    список short_recipes; recipes_count хранится в модели.
+    """
 
-    is_subscribed = serializers.SerializerMethodField(read_only=True)
-    recipes = ShortRecipesSerializer(read_only=True, many=True)
+    is_subscribed = serializers.BooleanField(read_only=True)
+    recipes = ShortRecipesSerializer(
+        source="short_recipes", read_only=True, many=True
+    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         fields = (
@@ -92,24 +111,12 @@ class ProfileWRecipesSerializer(serializers.ModelSerializer):
             "username",
             "first_name",
             "last_name",
-            "password",
             "is_subscribed",
             "recipes",
+            "recipes_count",
         )
-        read_only_fields = ("id", "is_subscribed")
-        extra_kwargs = {"password": {"write_only": True, "min_length": 4}}
         model = User
 
-    def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        if user.is_authenticated:
-            return user.follower.filter(author=obj).exists()
-
-        return False
-
-    def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
-
 # #####################USER##########################
 
 
@@ -132,39 +139,56 @@ class PasswordChangeSerializer(serializers.Serializer):
 
 
 class ObtainTokenSerializer(serializers.ModelSerializer):
+    email = serializers.CharField(max_length=254)
+
     class Meta:
         model = User
         fields = ("password", "email")
 
     def validate(self, data):
-        user = get_object_or_404(User, email=data.get("email", None))
-        authenticate_kwargs = {
-            "username": user.username,
-            "password": data.get("password", None),
-        }
-        user = authenticate(**authenticate_kwargs)
+        user = authenticate(
+            self.context.get("request"),
+            email=data["email"],
+            password=data["password"],
+        )
         if user is None:
             raise exceptions.ValidationError("Неверный email или пароль!")
-        token, created = Token.objects.get_or_create(user=user)
+        try:
+            token = user.auth_token
+        except ObjectDoesNotExist:
+            token = Token.objects.create(user=user)
         return {
             "auth_token": str(token),
         }
 
 
 class FollowSerializer(serializers.ModelSerializer):
-    user = serializers.SerializerMethodField(read_only=True)
-    author = serializers.SerializerMethodField(read_only=True)
+    """Сериализатор создания подписки."""
 
     class Meta:
         model = Follow
-        fields = (
-            "author",
-        )
+        fields = ("user", "author")
+        validators = [
+            UniqueTogetherValidator(
+                queryset=Follow.objects.all(),
+                fields=("user", "author"),
+                message="Вы уже подписаны на этого автора.",
+            )
+        ]
 
-    def get_author(self, obj):
-        return ProfileSerializer(
-            instance=obj.author, read_only=True, context=self.context
-        ).data
+    def validate(self, data):
+        if data["user"] == data["author"]:
+            raise serializers.ValidationError(
+                "Нельзя подписываться на самого себя!"
+            )
+        return data
+
+    def to_representation(self, instance):
+        return {
+            "author": ProfileSerializer(
+                instance=instance.author, context=self.context
+            ).data
+        }
 
 # #####################RECIPES##########################
 
@@ -211,20 +235,25 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipesSerializer(serializers.ModelSerializer):
-    """Сериалайзер рецептов"""
+    """
+    Сериалайзер рецептов.
+    Теги принимаются списком id, а выводятся объектами.
+    """
 
     image = Base64ImageField(required=True, use_url=False)
     ingredients = RecipeIngredientSerializer(
-        many=True, source="recipe_ingr.all"
+        many=True, source="recipe_ingr"
     )
     author = serializers.SerializerMethodField(read_only=True)
-    tags = TagSerializer(many=True)
+    tags = TagSerializer(many=True, read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
+            "id",
             "tags",
             "author",
             "ingredients",
@@ -232,6 +261,7 @@ class RecipesSerializer(serializers.ModelSerializer):
             "is_favorited",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
@@ -242,20 +272,149 @@ class RecipesSerializer(serializers.ModelSerializer):
         ).data
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context["request"]
-        if request.user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
+        return getattr(obj, "is_in_shopping_cart", False)
 
     def get_is_favorited(self, obj):
-        request = self.context["request"]
-        if request.user.is_authenticated:
-            return Favorite.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
+        return getattr(obj, "is_favorited", False)
+
+    def get_image_variants(self, obj):
+        variants = obj.image_variants or {}
+        if variants.get("source") != obj.image.name:
+            return {}
+        return {
+            variant: variants[variant] for variant in VARIANTS
+            if variant in variants
+        }
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["image"] = get_variant(instance, "full")
+        return data
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+        if "tags" in data or not self.partial:
+            validated_data["tags"] = self.validate_tags(data.get("tags"))
+        return validated_data
+
+    def validate_tags(self, value):
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError(
+                {"tags": "Нужно указать хотя бы один тег."}
+            )
+        if not all(isinstance(tag_id, int) for tag_id in value):
+            raise serializers.ValidationError(
+                {"tags": "Ожидается список id тегов."}
+            )
+        tag_ids = set(value)
+        if len(tag_ids) != len(value):
+            raise serializers.ValidationError(
+                {"tags": "Теги не должны повторяться."}
+            )
+        existing = set(
+            Tag.objects.filter(pk__in=tag_ids).values_list("pk", flat=True)
+        )
+        if existing != tag_ids:
+            raise serializers.ValidationError(
+                {"tags": f"Теги не найдены: {sorted(tag_ids - existing)}"}
+            )
+        return list(tag_ids)
+
+    def validate_ingredients(self, value):
+        if not value:
+            raise serializers.ValidationError(
+                "Нужно указать хотя бы один ингредиент."
+            )
+        ingredient_ids = {item["ingredient"]["id"] for item in value}
+        if len(ingredient_ids) != len(value):
+            raise serializers.ValidationError(
+                "Ингредиенты не должны повторяться."
+            )
+        existing = set(
+            Ingredient.objects.filter(
+                pk__in=ingredient_ids
+            ).values_list("pk", flat=True)
+        )
+        if existing != ingredient_ids:
+            raise serializers.ValidationError(
+                "Ингредиенты не найдены: "
+                f"{sorted(ingredient_ids - existing)}"
+            )
+        return value
+
+    @staticmethod
+    def get_amounts(ingredients):
+        return {
+            item["ingredient"]["id"]: item["amount"] for item in ingredients
+        }
+
+    @transaction.atomic
+    def create(self, validated_data):
+        amounts = self.get_amounts(validated_data.pop("recipe_ingr"))
+        tags = validated_data.pop("tags")
+        recipe = Recipe.objects.create(**validated_data)
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+        )
+        return recipe
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        ingredients = validated_data.pop("recipe_ingr", None)
+        tags = validated_data.pop("tags", None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, self.get_amounts(ingredients))
+        return instance
+
+    def update_ingredients(self, recipe, amounts):
+        """
+        Применяет к рецепту только разницу в составе ингредиентов.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        removed = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        added = []
+        deltas = {
+            ingredient_id: -recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in amounts
+        }
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                added.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+                deltas[ingredient_id] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if deltas:
+            shopping_list.change_recipe(recipe.pk, deltas)
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -278,3 +437,27 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             "user",
             "recipe",
         )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_RECIPES,
+    )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Строка списка покупок с данными ингредиента."""
+
+    id = serializers.IntegerField(source="ingredient_id")
+    name = serializers.CharField(source="ingredient.name")
+    measurement_unit = serializers.CharField(
+        source="ingredient.measurement_unit"
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ("id", "name", "measurement_unit", "amount")
@@ -0,0 +1,61 @@
+import csv
+
+from recipes.models import ShoppingListItem
+
+SHOPPING_CART_FORMATS = {
+    "txt": "text/plain; charset=UTF-8",
+    "csv": "text/csv; charset=UTF-8",
+    "pdf": "application/pdf",
+}
+
+
+def get_shopping_list(user):
+    """
+    Суммарное количество ингредиентов из списка покупок пользователя.
+    Читается из ShoppingListItem, который поддерживается
+    при изменении корзины, без агрегации по рецептам.
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+        .values_list(
+            "ingredient__name", "ingredient__measurement_unit", "amount"
+        )
+    )
+
+
+def render_txt(rows):
+    yield "Список покупок\n\n"
+    for name, measurement_unit, total in rows:
+        yield f"{name} ({measurement_unit}) — {total}\n"
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("Ингредиент", "Единицы измерения", "Количество"))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+RENDERERS = {
+    "txt": render_txt,
+    "csv": render_csv,
+}
+
+
+def stream_shopping_list(user, file_format):
+    """
+    Генератор строк файла со списком покупок.
+    Строки читаются из базы сразу: под ASGI Django 3.2 перебирает
+    StreamingHttpResponse в цикле событий, где запросы к БД запрещены.
+    Список ограничен числом ингредиентов, так что это недорого.
+    """
+    rows = list(get_shopping_list(user))
+    return RENDERERS[file_format](rows)
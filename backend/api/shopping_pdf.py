@@ -0,0 +1,209 @@
+"""
+PDF-версия списка покупок.
+
+Рендеринг выполняется в ограниченном пуле процессов, готовые файлы
+кэшируются на диске по хэшу содержимого списка. Повторные загрузки
+отдаются nginx через X-Accel-Redirect из internal-локации. Старые файлы
+удаляет команда prune_shopping_list_pdfs.
+"""
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+RENDERER_VERSION = 1
+FONT_NAME = "ShoppingListFont"
+PAGE_MARGIN = 50
+LINE_HEIGHT = 20
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_pending = {}
+
+
+class PdfUnavailable(Exception):
+    """reportlab или шрифт с кириллицей не установлены, рендеринг упал."""
+
+
+class PdfBusy(Exception):
+    """Очередь рендеринга переполнена."""
+
+
+def get_cache_dir():
+    return Path(settings.SHOPPING_LIST_CACHE_DIR)
+
+
+def cache_key(rows):
+    payload = json.dumps(
+        [RENDERER_VERSION, [list(row) for row in rows]],
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def relative_path(key):
+    return f"{key[:2]}/{key}.pdf"
+
+
+def render_pdf(rows, path, font_path):
+    """Рисует PDF и атомарно кладет его в path. Работает в пуле."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(descriptor)
+
+    pdf = canvas.Canvas(temporary, pagesize=A4)
+    _, height = A4
+    top = height - PAGE_MARGIN
+    pdf.setFont(FONT_NAME, 18)
+    pdf.drawString(PAGE_MARGIN, top, "Список покупок")
+    pdf.setFont(FONT_NAME, 12)
+    y = top - 2 * LINE_HEIGHT
+    for name, measurement_unit, amount in rows:
+        if y < PAGE_MARGIN:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, 12)
+            y = top
+        pdf.drawString(
+            PAGE_MARGIN, y, f"□ {name} ({measurement_unit}) — {amount}"
+        )
+        y -= LINE_HEIGHT
+    pdf.save()
+    os.replace(temporary, path)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def reset_executor():
+    """Пул с упавшим процессом больше не принимает задачи."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def check_available():
+    if importlib.util.find_spec("reportlab") is None:
+        raise PdfUnavailable("reportlab не установлен.")
+    if not os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        raise PdfUnavailable(
+            f"Шрифт {settings.SHOPPING_LIST_PDF_FONT} не найден."
+        )
+
+
+def submit(key, rows, path):
+    """Ставит рендеринг в пул; одинаковые списки рендерятся один раз."""
+    with _lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        if len(_pending) >= settings.PDF_RENDER_QUEUE_SIZE:
+            raise PdfBusy()
+        future = get_executor().submit(
+            render_pdf, rows, str(path), settings.SHOPPING_LIST_PDF_FONT
+        )
+        _pending[key] = future
+    future.add_done_callback(lambda _: _pending.pop(key, None))
+    return future
+
+
+def get_pdf(rows, wait=None):
+    """
+    Путь к PDF списка rows или None, если файл еще готовится.
+    Ждет рендеринга не дольше wait секунд.
+    """
+    key = cache_key(rows)
+    path = get_cache_dir() / relative_path(key)
+    if path.exists():
+        return path
+    check_available()
+    try:
+        future = submit(key, list(rows), path)
+        future.result(
+            timeout=settings.PDF_RENDER_WAIT if wait is None else wait
+        )
+    except TimeoutError:
+        return None
+    except PdfBusy:
+        raise
+    except Exception as error:
+        logger.exception("Не удалось отрисовать список покупок %s", key)
+        if isinstance(error, BrokenProcessPool):
+            reset_executor()
+        raise PdfUnavailable("Рендеринг PDF завершился ошибкой.") from error
+    return path
+
+
+def prune_cache(max_age, max_size=None):
+    """
+    Удаляет файлы кэша старше max_age секунд, затем самые старые,
+    пока кэш больше max_size байт. Возвращает число удаленных файлов.
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir.exists():
+        return 0
+    files = []
+    for path in cache_dir.glob("*/*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    deadline = time.time() - max_age
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for mtime, size, path in files:
+        if mtime >= deadline and (max_size is None or total <= max_size):
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        deleted += 1
+    return deleted
+
+
+def pdf_response(path):
+    """
+    Ответ с файлом: через X-Accel-Redirect, если задан
+    SHOPPING_LIST_ACCEL_PREFIX, иначе силами Django.
+    """
+    prefix = settings.SHOPPING_LIST_ACCEL_PREFIX
+    if not prefix:
+        return FileResponse(
+            open(path, "rb"), content_type="application/pdf"
+        )
+    response = HttpResponse(content_type="application/pdf")
+    response["X-Accel-Redirect"] = (
+        prefix.rstrip("/") + "/"
+        + path.relative_to(get_cache_dir()).as_posix()
+    )
+    return response
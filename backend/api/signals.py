@@ -0,0 +1,84 @@
+from functools import partial
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import ingredient_index, response_cache
+from api import authentication
+from api.db import request_health_checks
+from recipes.images import variants_ready
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+
+def invalidate_on_commit(*namespaces):
+    transaction.on_commit(partial(response_cache.invalidate, *namespaces))
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    """
+    Подключается после close_old_connections из Django, поэтому
+    помечает только соединения, которые переживут этот запрос.
+    """
+    request_health_checks()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    invalidate_on_commit("ingredients", "recipes")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate_on_commit("tags", "recipes")
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(variants_ready, sender=Recipe)
+def invalidate_recipes(sender, **kwargs):
+    if kwargs.get("action", "post_").startswith("post_"):
+        invalidate_on_commit("recipes")
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    if instance.recipes.exists():
+        invalidate_on_commit("recipes")
+
+
+def revoke_tokens(keys):
+    for key in keys:
+        authentication.revoke(key)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    revoke_tokens([instance.key])
+    transaction.on_commit(partial(revoke_tokens, [instance.key]))
+
+
+@receiver(post_save, sender=User)
+def revoke_user_tokens(sender, instance, **kwargs):
+    """
+    Смена пароля, деактивация и т. п. Удаление пользователя покрывает
+    revoke_deleted_token: токены удаляются каскадом.
+    """
+    keys = list(
+        Token.objects.filter(user=instance).values_list("key", flat=True)
+    )
+    if keys:
+        revoke_tokens(keys)
+        transaction.on_commit(partial(revoke_tokens, keys))
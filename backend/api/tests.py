@@ -0,0 +1,1135 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from api import authentication, shopping_pdf
+from api.authentication import CachedTokenAuthentication, token_cache
+from api.cookable_index import CookableIndex
+from api.ingredient_index import IngredientIndex, invalidate
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingListItem,
+    SyncTombstone,
+    Tag,
+)
+from recipes.search import index_recipes, schedule_reindex
+from recipes.stemmer import stem, stem_words
+from users.models import Follow, User
+
+RECIPES_COUNT = 20
+TAGS_PER_RECIPE = 2
+INGREDIENTS_PER_RECIPE = 3
+
+
+class RecipeListQueriesTest(APITestCase):
+    """
+    Число запросов при выдаче списка рецептов не зависит от размера
+    страницы: авторы, теги, ингредиенты и флаги загружаются
+    фиксированным числом запросов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+            first_name="Автор",
+            last_name="Рецептов",
+        )
+        cls.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="reader-password",
+            first_name="Читатель",
+            last_name="Рецептов",
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        tags = [
+            Tag.objects.create(
+                name=f"Тег {number}", color="#ffffff", slug=f"tag-{number}"
+            )
+            for number in range(TAGS_PER_RECIPE)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(INGREDIENTS_PER_RECIPE)
+        ]
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f"Рецепт {number:02}",
+                text="Описание",
+                cooking_time=10,
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients
+            )
+            if number % 2:
+                Favorite.objects.create(user=cls.reader, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def assert_constant_list_queries(self, client, expected):
+        for limit in (2, RECIPES_COUNT):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = client.get("/api/recipes/", {"limit": limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_anonymous_list_queries_do_not_grow(self):
+        self.assert_constant_list_queries(self.get_client(), 5)
+
+    def test_authenticated_list_queries_do_not_grow(self):
+        self.assert_constant_list_queries(self.get_client(self.reader), 5)
+
+    def test_detail_queries(self):
+        recipe = Recipe.objects.first()
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                cache.clear()
+                client = self.get_client(user)
+                with self.assertNumQueries(5):
+                    response = client.get(f"/api/recipes/{recipe.pk}/")
+                self.assertEqual(response.status_code, 200)
+
+
+class ProcessRecipeImagesTest(TestCase):
+    """Команда process_recipe_images обрабатывает все картинки подряд."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+
+    def make_image(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), "orange").save(buffer, "PNG")
+        return SimpleUploadedFile(
+            "recipe.png", buffer.getvalue(), content_type="image/png"
+        )
+
+    def test_builds_variants_and_touches_recipes(self):
+        recipes = [
+            Recipe.objects.create(
+                author=self.author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                cooking_time=10,
+                image=self.make_image(),
+            )
+            for number in range(2)
+        ]
+
+        call_command("process_recipe_images", stdout=StringIO())
+
+        for recipe in recipes:
+            with self.subTest(recipe=recipe.pk):
+                previous = recipe.updated_at
+                recipe.refresh_from_db()
+                self.assertEqual(
+                    recipe.image_variants["source"], recipe.image.name
+                )
+                self.assertIn("thumbnail", recipe.image_variants)
+                self.assertGreater(recipe.updated_at, previous)
+
+    def test_min_age_skips_recent_recipes(self):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name="Рецепт",
+            text="Описание",
+            cooking_time=10,
+            image=self.make_image(),
+        )
+
+        call_command(
+            "process_recipe_images", "--min-age", "10", stdout=StringIO()
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+
+        Recipe.objects.filter(pk=recipe.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=11)
+        )
+        call_command(
+            "process_recipe_images", "--min-age", "10", stdout=StringIO()
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants["source"], recipe.image.name)
+
+
+class LoadIngredientsCacheTest(APITestCase):
+    """После загрузки каталога анонимы получают новый список."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f"{directory}/ingredients.csv"
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("абрикосы,г\nбананы,шт\n")
+
+    def test_response_and_etag_change_after_load(self):
+        response = self.client.get("/api/ingredients/")
+        self.assertEqual(response.data["count"], 0)
+        old_etag = response["ETag"]
+
+        call_command("load_ingredients", self.path, stdout=StringIO())
+
+        response = self.client.get(
+            "/api/ingredients/", HTTP_IF_NONE_MATCH=old_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        self.assertNotEqual(response["ETag"], old_etag)
+        self.assertEqual(
+            self.client.get(
+                "/api/ingredients/", HTTP_IF_NONE_MATCH=response["ETag"]
+            ).status_code,
+            304,
+        )
+
+
+class RecipeUpdateQueriesTest(APITestCase):
+    """Обновление рецепта не тратит запрос на каждый удаленный ингредиент."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        cls.tag = Tag.objects.create(name="Тег", color="#ffffff", slug="tag")
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(11)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def count_update_queries(self, removed):
+        recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10,
+        )
+        recipe.tags.add(self.tag)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[:removed + 1]
+        )
+        data = {
+            "name": "Рецепт",
+            "text": "Описание",
+            "cooking_time": 10,
+            "tags": [self.tag.pk],
+            "ingredients": [{"id": self.ingredients[0].pk, "amount": 1}],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    f"/api/recipes/{recipe.pk}/", data, format="json"
+                )
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_removed_ingredients_do_not_add_queries(self):
+        self.assertEqual(
+            self.count_update_queries(2), self.count_update_queries(10)
+        )
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """Отзыв токена виден процессам, у которых он закэширован."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="user-password",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def revoke_in_other_process(self):
+        """Другой воркер меняет только поколение в общем кэше."""
+        entry = token_cache.get(self.token.key)
+        authentication.revoke(self.token.key)
+        token_cache.set(self.token.key, entry)
+
+    def test_cached_token_skips_database(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_token_deleted_elsewhere_is_rejected(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        Token.objects.filter(pk=self.token.pk).update(key="replaced")
+        self.revoke_in_other_process()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_user_deactivated_elsewhere_is_rejected(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.revoke_in_other_process()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+
+class AdminShoppingListTest(TestCase):
+    """Правки рецептов и корзин в админке меняют списки покупок."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="admin-password",
+        )
+        self.buyer = User.objects.create_user(
+            username="buyer",
+            email="buyer@example.com",
+            password="buyer-password",
+        )
+        self.client.force_login(self.admin)
+        self.tag = Tag.objects.create(name="Тег", color="#ffffff", slug="tag")
+        self.flour, self.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("мука", "сахар")
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.admin, name="Пирог", text="Описание",
+            cooking_time=10,
+        )
+        self.recipe.tags.add(self.tag)
+        self.row = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.flour, amount=100
+        )
+        self.client.post(
+            "/admin/recipes/shoppingcart/add/",
+            {"user": self.buyer.pk, "recipe": self.recipe.pk},
+        )
+
+    def shopping_list(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.buyer).values_list(
+                "ingredient_id", "amount"
+            )
+        )
+
+    def test_cart_added_in_admin(self):
+        self.assertEqual(self.shopping_list(), {self.flour.pk: 100})
+
+    def test_ingredients_changed_in_admin(self):
+        response = self.client.post(
+            f"/admin/recipes/recipe/{self.recipe.pk}/change/",
+            {
+                "name": "Пирог",
+                "text": "Описание",
+                "cooking_time": 10,
+                "author": self.admin.pk,
+                "tags": [self.tag.pk],
+                "recipe_ingr-TOTAL_FORMS": 2,
+                "recipe_ingr-INITIAL_FORMS": 1,
+                "recipe_ingr-0-id": self.row.pk,
+                "recipe_ingr-0-recipe": self.recipe.pk,
+                "recipe_ingr-0-ingredient": self.flour.pk,
+                "recipe_ingr-0-amount": 250,
+                "recipe_ingr-1-recipe": self.recipe.pk,
+                "recipe_ingr-1-ingredient": self.sugar.pk,
+                "recipe_ingr-1-amount": 50,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 250, self.sugar.pk: 50}
+        )
+
+    def test_recipe_deleted_in_admin(self):
+        self.client.post(
+            f"/admin/recipes/recipe/{self.recipe.pk}/delete/",
+            {"post": "yes"},
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_recipes_deleted_by_admin_action(self):
+        self.client.post(
+            "/admin/recipes/recipe/",
+            {
+                "action": "delete_selected",
+                "_selected_action": [self.recipe.pk],
+                "post": "yes",
+            },
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.shopping_list(), {})
+
+
+class ShoppingListPdfTest(APITestCase):
+    """Ошибки рендеринга и очистка дискового кэша PDF."""
+
+    def setUp(self):
+        cache.clear()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(
+            SHOPPING_LIST_CACHE_DIR=self.cache_dir
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_file(self, name, age, size=10):
+        path = os.path.join(self.cache_dir, name[:2], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(b"%" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_render_error_returns_503(self):
+        user = User.objects.create_user(
+            username="buyer",
+            email="buyer@example.com",
+            password="buyer-password",
+        )
+        self.client.force_authenticate(user)
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        failing_render = mock.patch.object(
+            shopping_pdf, "render_pdf", side_effect=OSError("диск заполнен")
+        )
+        with mock.patch.object(
+            shopping_pdf, "get_executor", return_value=executor
+        ), mock.patch.object(
+            shopping_pdf, "check_available"
+        ), failing_render, self.assertLogs("api.shopping_pdf", "ERROR"):
+            response = self.client.get(
+                "/api/recipes/download_shopping_cart/",
+                {"file_format": "pdf"},
+            )
+        self.assertEqual(response.status_code, 503)
+
+    def test_prune_by_age_and_size(self):
+        old = self.make_file("aa" + "0" * 62 + ".pdf", age=10 * 86400)
+        older = self.make_file("bb" + "0" * 62 + ".pdf", age=3 * 86400)
+        fresh = self.make_file("cc" + "0" * 62 + ".pdf", age=86400)
+        newest = self.make_file("dd" + "0" * 62 + ".pdf", age=0)
+
+        self.assertEqual(shopping_pdf.prune_cache(7 * 86400), 1)
+        self.assertFalse(os.path.exists(old))
+
+        self.assertEqual(shopping_pdf.prune_cache(7 * 86400, max_size=20), 1)
+        self.assertFalse(os.path.exists(older))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(newest))
+
+        call_command(
+            "prune_shopping_list_pdfs", "--days", "0.5", stdout=StringIO()
+        )
+        self.assertFalse(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(newest))
+
+
+class CountersTest(APITestCase):
+    """Удаление строк, созданных в обход API, не ломает счетчики."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        self.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="reader-password",
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10,
+        )
+
+    def test_delete_recipe_created_outside_api(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f"/api/recipes/{self.recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_remove_relations_created_outside_api(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_authenticate(self.reader)
+        for url in (
+            f"/api/recipes/{self.recipe.pk}/favorite/",
+            f"/api/recipes/{self.recipe.pk}/shopping_cart/",
+            f"/api/users/{self.author.pk}/subscribe/",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.delete(url).status_code, 204)
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.recipe.shopping_cart_count, 0)
+        self.assertEqual(self.author.followers_count, 0)
+
+
+class CookableIndexTest(TestCase):
+    """Подбор рецептов по ингредиентам из индекса в памяти."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            ).pk
+            for number in range(4)
+        ]
+        self.pair = self.make_recipe(self.ingredients[:2])
+        self.four = self.make_recipe(self.ingredients)
+        self.single = self.make_recipe(self.ingredients[2:3])
+        self.index = CookableIndex(refresh_interval=0)
+
+    def make_recipe(self, ingredient_ids):
+        recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10,
+        )
+        for ingredient_id in ingredient_ids:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient_id=ingredient_id, amount=1
+            )
+        return recipe.pk
+
+    def test_scoring_limit_and_min_coverage(self):
+        owned = self.ingredients[:2]
+        self.assertEqual(
+            self.index.search(owned, 10), [(self.pair, 1.0), (self.four, 0.5)]
+        )
+        self.assertEqual(self.index.search(owned, 1), [(self.pair, 1.0)])
+        self.assertEqual(
+            self.index.search(owned, 10, min_coverage=0.6),
+            [(self.pair, 1.0)],
+        )
+
+    def test_refresh_picks_up_changes(self):
+        self.index.search(self.ingredients[:1], 10)
+        added = self.make_recipe(self.ingredients[:1])
+        RecipeIngredient.objects.filter(
+            recipe_id=self.four, ingredient_id=self.ingredients[3]
+        ).delete()
+        Recipe.objects.get(pk=self.four).save()
+
+        matches = dict(self.index.search(self.ingredients[:2], 10))
+        self.assertEqual(matches[added], 1.0)
+        self.assertAlmostEqual(matches[self.four], 2 / 3)
+
+    def test_discard_and_readers_keep_their_arrays(self):
+        self.index.search(self.ingredients, 10)
+        postings = self.index._postings[self.ingredients[2]]
+        Recipe.objects.filter(pk=self.single).delete()
+        self.assertIn(
+            self.single,
+            [pk for pk, _ in self.index.search(self.ingredients[2:3], 10)],
+        )
+        self.index.discard([self.single])
+        self.assertEqual(list(postings), sorted([self.four, self.single]))
+        self.assertEqual(
+            [pk for pk, _ in self.index.search(self.ingredients[2:3], 10)],
+            [self.four],
+        )
+
+
+class IngredientIndexTest(TestCase):
+    """Поиск ингредиентов по префиксу и подстроке."""
+
+    def setUp(self):
+        cache.clear()
+        for name in ("сахар", "сахарная пудра", "ванильный сахар", "соль"):
+            Ingredient.objects.create(name=name, measurement_unit="г")
+        self.index = IngredientIndex()
+
+    def names(self, query):
+        return [entry.name for entry in self.index.search(query)]
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(
+            self.names("Сахар"),
+            ["сахар", "сахарная пудра", "ванильный сахар"],
+        )
+
+    def test_rebuild_replaces_snapshot(self):
+        snapshot = self.index.refresh()
+        Ingredient.objects.create(
+            name="тростниковый сахар", measurement_unit="г"
+        )
+        invalidate()
+        self.assertIn("тростниковый сахар", self.names("сахар"))
+        self.assertIsNot(self.index.refresh(), snapshot)
+        self.assertEqual(len(snapshot.entries), 4)
+        self.assertEqual(self.index.get_state()[0], 5)
+
+
+class RecipeDetailConditionalTest(APITestCase):
+    """ETag рецепта меняется вместе с профилем автора."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+            first_name="Старое",
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10,
+        )
+        self.url = f"/api/recipes/{self.recipe.pk}/"
+
+    def test_author_change_updates_etag(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+
+        self.author.first_name = "Новое"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["author"]["first_name"], "Новое")
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class RecipeSearchTest(APITestCase):
+    """Полнотекстовый поиск рецептов (FTS5 на SQLite)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        cherry = Ingredient.objects.create(name="вишня", measurement_unit="г")
+        cls.by_ingredient = Recipe.objects.create(
+            author=author, name="Пирог", text="Тесто", cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.by_ingredient, ingredient=cherry, amount=100
+        )
+        cls.by_name = Recipe.objects.create(
+            author=author, name="Вишневый пирог", text="Сладкий",
+            cooking_time=10,
+        )
+        cls.by_text = Recipe.objects.create(
+            author=author, name="Запеканка", text="Можно добавить вишни",
+            cooking_time=10,
+        )
+        Recipe.objects.create(
+            author=author, name="Суп", text="Горячий", cooking_time=10
+        )
+        index_recipes(Recipe.objects.values_list("pk", flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_ordered_by_relevance(self):
+        response = self.client.get("/api/recipes/", {"search": "вишни"})
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.by_name.pk, self.by_ingredient.pk, self.by_text.pk],
+        )
+
+    def test_word_forms_and_prefixes_match(self):
+        for query in ("вишней", "пирогами", "запек"):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    "/api/recipes/", {"search": query}
+                )
+                self.assertTrue(response.data["results"])
+
+    def test_search_combines_with_filters(self):
+        response = self.client.get(
+            "/api/recipes/",
+            {"search": "пирог", "author": self.by_name.author_id},
+        )
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.by_name.pk, self.by_ingredient.pk],
+        )
+
+
+class StemmerTest(TestCase):
+    """Основы слов русского стеммера Snowball."""
+
+    def test_stems(self):
+        for word, expected in (
+            ("вишня", "вишн"),
+            ("вишни", "вишн"),
+            ("пирогами", "пирог"),
+            ("сладкий", "сладк"),
+            ("ёлка", "елк"),
+        ):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_stem_words_splits_and_lowercases(self):
+        self.assertEqual(
+            stem_words("Вишневый пирог, 2 шт."),
+            ["вишнев", "пирог", "2", "шт"],
+        )
+
+
+class PendingReindexTest(TransactionTestCase):
+    """Откаченная транзакция не оставляет отложенных идентификаторов."""
+
+    def test_rolled_back_ids_are_dropped(self):
+        with mock.patch("recipes.search.index_recipes") as index:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    schedule_reindex([1])
+                    raise RuntimeError
+            with transaction.atomic():
+                schedule_reindex([2])
+        index.assert_called_once_with([2])
+
+
+@override_settings(FEED_FANOUT_LIMIT=1)
+class FeedTest(APITestCase):
+    """Лента подписок: разосланные и неразосланные рецепты по курсору."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(
+            username="reader",
+            email="reader@example.com",
+            password="reader-password",
+        )
+        self.other = User.objects.create_user(
+            username="other",
+            email="other@example.com",
+            password="other-password",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        self.popular = User.objects.create_user(
+            username="popular",
+            email="popular@example.com",
+            password="popular-password",
+        )
+        self.stranger = User.objects.create_user(
+            username="stranger",
+            email="stranger@example.com",
+            password="stranger-password",
+        )
+        for user in (self.reader, self.other):
+            Follow.objects.create(user=user, author=self.popular)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.tag = Tag.objects.create(name="Тег", color="#ffffff", slug="tag")
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, number):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", text="Описание",
+                cooking_time=10,
+            )
+        return recipe
+
+    def read_feed(self, url="/api/recipes/feed/?limit=3"):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe["id"] for recipe in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_merges_fanned_out_and_popular_authors(self):
+        recipes = [
+            self.publish(
+                (self.author, self.popular, self.stranger)[number % 3], number
+            )
+            for number in range(10)
+        ]
+        self.assertTrue(Recipe.objects.get(pk=recipes[0].pk).fanned_out)
+        self.assertFalse(Recipe.objects.get(pk=recipes[1].pk).fanned_out)
+        expected = [
+            recipe.pk for recipe in reversed(recipes)
+            if recipe.author_id != self.stranger.pk
+        ]
+        self.assertEqual(self.read_feed(), expected)
+
+        response = self.client.get("/api/recipes/feed/?limit=3")
+        following = self.client.get(response.data["next"])
+        previous = self.client.get(following.data["previous"])
+        self.assertEqual(previous.data["results"], response.data["results"])
+
+    def test_filters_apply_before_paging(self):
+        tagged = []
+        for number in range(8):
+            recipe = self.publish((self.author, self.popular)[number % 2], 0)
+            if number % 3 == 0:
+                recipe.tags.add(self.tag)
+                tagged.append(recipe.pk)
+        self.assertEqual(
+            self.read_feed("/api/recipes/feed/?limit=1&tags=tag"),
+            list(reversed(tagged)),
+        )
+
+    def test_follow_and_unfollow_update_feed(self):
+        recipe = self.publish(self.stranger, 0)
+        with transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.stranger)
+        self.assertEqual(self.read_feed(), [recipe.pk])
+        Follow.objects.filter(user=self.reader, author=self.stranger).delete()
+        self.assertEqual(self.read_feed(), [])
+
+
+@override_settings(SYNC_OVERLAP=0, SYNC_TOMBSTONE_TTL_DAYS=30)
+class SyncTest(APITestCase):
+    """Дельта-синхронизация избранного, корзины и подписок."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="user-password",
+        )
+        self.author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10,
+        )
+        self.client.force_authenticate(self.user)
+        self.now = timezone.now()
+        patcher = mock.patch(
+            "django.utils.timezone.now", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tick(self, seconds=1):
+        self.now += timedelta(seconds=seconds)
+
+    def sync(self, version=None):
+        params = {} if version is None else {"version": version}
+        response = self.client.get("/api/users/sync/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_add_remove_and_add_again(self):
+        initial = self.sync()
+        self.assertTrue(initial["reset"])
+        favorite_url = f"/api/recipes/{self.recipe.pk}/favorite/"
+
+        self.tick()
+        self.client.post(favorite_url)
+        added = self.sync(initial["version"])
+        self.assertFalse(added["reset"])
+        self.assertEqual(
+            added["favorites"], {"added": [self.recipe.pk], "removed": []}
+        )
+
+        self.tick()
+        self.client.delete(favorite_url)
+        removed = self.sync(added["version"])
+        self.assertEqual(
+            removed["favorites"], {"added": [], "removed": [self.recipe.pk]}
+        )
+
+        self.tick()
+        self.client.post(favorite_url)
+        for version in (removed["version"], initial["version"]):
+            with self.subTest(version=version):
+                self.assertEqual(
+                    self.sync(version)["favorites"],
+                    {"added": [self.recipe.pk], "removed": []},
+                )
+        self.tick()
+        latest = self.sync()
+        self.tick()
+        self.assertEqual(
+            self.sync(latest["version"])["favorites"],
+            {"added": [], "removed": []},
+        )
+
+    def test_recipe_delete_records_cascaded_removals(self):
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.client.post(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.client.post(f"/api/users/{self.author.pk}/subscribe/")
+        self.tick()
+        version = self.sync()["version"]
+
+        self.tick()
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f"/api/recipes/{self.recipe.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.client.force_authenticate(self.user)
+
+        changes = self.sync(version)
+        self.assertEqual(changes["favorites"]["removed"], [self.recipe.pk])
+        self.assertEqual(
+            changes["shopping_cart"]["removed"], [self.recipe.pk]
+        )
+        self.assertEqual(
+            changes["subscriptions"], {"added": [], "removed": []}
+        )
+
+    def test_expired_version_resets(self):
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        version = self.sync()["version"]
+        self.tick(31 * 24 * 60 * 60)
+        changes = self.sync(version)
+        self.assertTrue(changes["reset"])
+        self.assertEqual(changes["favorites"]["added"], [self.recipe.pk])
+
+    @override_settings(SYNC_OVERLAP=60)
+    def test_overlap_repeats_recent_changes(self):
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.tick(30)
+        version = self.sync()["version"]
+        self.tick(60)
+        self.assertEqual(
+            self.sync(version)["favorites"]["added"], [self.recipe.pk]
+        )
+        self.assertEqual(
+            self.sync(self.sync()["version"])["favorites"]["added"], []
+        )
+
+    def test_invalid_version(self):
+        response = self.client.get("/api/users/sync/", {"version": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune_removes_expired_tombstones(self):
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.client.delete(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.tick(31 * 24 * 60 * 60)
+        self.client.post(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.client.delete(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+
+        call_command("prune_sync_tombstones", stdout=StringIO())
+        self.assertEqual(
+            list(SyncTombstone.objects.values_list("kind", flat=True)),
+            [SyncTombstone.SHOPPING_CART],
+        )
+
+
+class BulkSelectionTest(APITestCase):
+    """Пакетное добавление и удаление рецептов в корзине и избранном."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="user-password",
+        )
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="author-password",
+        )
+        self.flour, self.sugar = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("мука", "сахар")
+        )
+        self.recipes = []
+        amounts = ((100, 0), (200, 10), (0, 5))
+        for number, recipe_amounts in enumerate(amounts):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", text="Описание",
+                cooking_time=10,
+            )
+            for ingredient, amount in zip(
+                (self.flour, self.sugar), recipe_amounts
+            ):
+                if amount:
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=amount
+                    )
+            self.recipes.append(recipe.pk)
+        self.client.force_authenticate(self.user)
+
+    def change(self, method, url, recipe_ids):
+        response = getattr(self.client, method)(
+            url, {"recipes": recipe_ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (result["id"], result["status"])
+            for result in response.data["results"]
+        ]
+
+    def shopping_list(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.user).values_list(
+                "ingredient_id", "amount"
+            )
+        )
+
+    def counters(self, field):
+        return list(
+            Recipe.objects.filter(pk__in=self.recipes)
+            .order_by("pk").values_list(field, flat=True)
+        )
+
+    def test_shopping_cart_add_and_remove(self):
+        first, second, third = self.recipes
+        url = "/api/recipes/bulk_shopping_cart/"
+        self.client.post(f"/api/recipes/{first}/shopping_cart/")
+
+        self.assertEqual(
+            self.change("post", url, [first, second, 999, second]),
+            [(first, "already_added"), (second, "added"), (999, "not_found")],
+        )
+        self.assertEqual(
+            self.shopping_list(), {self.flour.pk: 300, self.sugar.pk: 10}
+        )
+        self.assertEqual(self.counters("shopping_cart_count"), [1, 1, 0])
+
+        self.assertEqual(
+            self.change("delete", url, [second, third, 999]),
+            [(second, "removed"), (third, "not_added"), (999, "not_found")],
+        )
+        self.assertEqual(self.shopping_list(), {self.flour.pk: 100})
+        self.assertEqual(self.counters("shopping_cart_count"), [1, 0, 0])
+        self.assertTrue(
+            SyncTombstone.objects.filter(
+                user=self.user, kind=SyncTombstone.SHOPPING_CART,
+                object_id=second,
+            ).exists()
+        )
+
+        self.change("post", url, [second])
+        self.assertFalse(SyncTombstone.objects.exists())
+
+    def test_favorites_add_and_remove(self):
+        first, second, third = self.recipes
+        url = "/api/recipes/bulk_favorite/"
+        self.assertEqual(
+            self.change("post", url, [first, third]),
+            [(first, "added"), (third, "added")],
+        )
+        self.assertEqual(self.counters("favorites_count"), [1, 0, 1])
+        self.assertEqual(
+            self.change("delete", url, [third, second]),
+            [(third, "removed"), (second, "not_added")],
+        )
+        self.assertEqual(self.counters("favorites_count"), [1, 0, 0])
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_rejects_invalid_payload(self):
+        for payload in ({"recipes": []}, {"recipes": ["x"]}, {}):
+            with self.subTest(payload=payload):
+                response = self.client.post(
+                    "/api/recipes/bulk_favorite/", payload, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class ConnectionHealthCheckTest(TransactionTestCase):
+    """Соединение проверяется при первом обращении к базе в запросе."""
+
+    def setUp(self):
+        cache.clear()
+        connection.settings_dict["CONN_HEALTH_CHECKS"] = True
+        self.addCleanup(connection.settings_dict.pop, "CONN_HEALTH_CHECKS")
+        self.addCleanup(setattr, connection, "health_check_pending", False)
+        self.client = APIClient()
+        self.client.get("/api/recipes/")
+
+    def test_cached_response_skips_check(self):
+        with mock.patch.object(connection, "is_usable") as is_usable:
+            self.assertEqual(self.client.get("/api/recipes/").status_code, 200)
+        is_usable.assert_not_called()
+
+    def test_checked_once_per_request(self):
+        with mock.patch.object(
+            connection, "is_usable", return_value=True
+        ) as is_usable:
+            self.client.get("/api/tags/")
+            self.client.get("/api/ingredients/")
+        self.assertEqual(is_usable.call_count, 2)
+
+    def test_unusable_connection_is_reopened(self):
+        with mock.patch.object(
+            connection, "is_usable", return_value=False
+        ), mock.patch.object(
+            connection, "close", wraps=connection.close
+        ) as close:
+            self.assertEqual(self.client.get("/api/tags/").status_code, 200)
+        close.assert_called_once()
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import make_async
 from api.views import (
     DeleteTokenView,
     ObtainTokenView,
@@ -32,8 +34,12 @@ router.register(r"recipes/download_shopping_cart",
 router.register(r"ingredients", IngredientViewSet, basename="ingredient")
 
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = make_async(router_urls)
+
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(router_urls)),
     path("auth/token/login/", ObtainTokenView.as_view(), name="login"),
     path("auth/token/logout/", DeleteTokenView.as_view(), name="logout"),
 ]
@@ -1,28 +1,73 @@
-from rest_framework import generics, status, views, viewsets
+from functools import partial
+
+from rest_framework import exceptions, generics, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly
+)
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value
+)
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 
+from api.conditional import (
+    CatalogConditionalGetMixin,
+    conditional_response,
+    make_etag
+)
+from api.cookable_index import (
+    COOKABLE_LIMIT,
+    COOKABLE_MAX_INGREDIENTS,
+    cookable_index,
+)
+from api.filters import RecipeFilter
+from api.ingredient_index import ingredient_index
+from api.pagination import IdCursorPagination, LimitOffsetOrCursorPagination
 from api.permissions import IsOwnerOrReadOnly
+from api.response_cache import AnonymousResponseCacheMixin
+from api import shopping_pdf
+from api.shopping_cart import (
+    SHOPPING_CART_FORMATS,
+    get_shopping_list,
+    stream_shopping_list,
+)
 
 from users.models import (
     User,
     Follow
 )
+from recipes.counters import change_counter, recount_recipes
+from recipes import shopping_list, sync
+from recipes.feed import feed_recipe_ids
+from recipes.popularity import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    PERIODS,
+    popular_recipe_ids,
+)
 from recipes.models import (
     Tag,
     Ingredient,
     # RecipeIngredient,
     Recipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem,
 )
 from api.serializers import (
     ProfileSerializer,
+    ProfileWRecipesSerializer,
     TagSerializer,
     IngredientSerializer,
     RecipesSerializer,
@@ -30,9 +75,17 @@ from api.serializers import (
     ShoppingCartSerializer,
     PasswordChangeSerializer,
     ObtainTokenSerializer,
-    FollowSerializer
+    FollowSerializer,
+    RecipeIdsSerializer,
+    ShoppingListItemSerializer,
 )
 
+# Статусы пакетных операций: (изменено, уже было так).
+BULK_STATUSES = {
+    "POST": ("added", "already_added"),
+    "DELETE": ("removed", "not_added"),
+}
+
 
 class UsersViewSet(
     generics.ListCreateAPIView,
@@ -43,6 +96,7 @@ class UsersViewSet(
 
     serializer_class = ProfileSerializer
     permission_classes = [AllowAny]
+    pagination_class = LimitOffsetOrCursorPagination
 
     def get_queryset(self):
         return User.objects.all()
@@ -86,14 +140,72 @@ class UsersViewSet(
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
-        if self.paginate_queryset(queryset) is not None:
-            serializer = ProfileSerializer(
-                self.paginate_queryset(queryset),
-                context={"request": request},
-                many=True
+        queryset = self.get_subscriptions_queryset(request)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = ProfileWRecipesSerializer(
+                page, context={"request": request}, many=True
             )
-        return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = ProfileWRecipesSerializer(
+            queryset, context={"request": request}, many=True
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="sync",
+        permission_classes=[IsAuthenticated],
+    )
+    def sync(self, request):
+        """
+        Изменения избранного, списка покупок и подписок
+        с версии ?version=, полученной при прошлой синхронизации.
+        """
+        try:
+            changes = sync.get_changes(
+                request.user, request.query_params.get("version")
+            )
+        except sync.InvalidVersion:
+            raise exceptions.ValidationError(
+                {"version": "Некорректная версия."}
+            )
+        return Response(changes)
+
+    def get_subscriptions_queryset(self, request):
+        """
+        Авторы из подписок пользователя с превью рецептов.
+        recipes_count хранится в модели, is_subscribed истинен
+        для всех авторов по построению запроса.
+        """
+        recipes = Recipe.objects.order_by("-id")
+        recipes_limit = request.query_params.get("recipes_limit")
+        if recipes_limit is not None:
+            try:
+                recipes_limit = int(recipes_limit)
+            except ValueError:
+                raise exceptions.ValidationError(
+                    {"recipes_limit": "Ожидается целое число."}
+                )
+            if recipes_limit < 0:
+                raise exceptions.ValidationError(
+                    {"recipes_limit": "Ожидается неотрицательное число."}
+                )
+            recipes = recipes.filter(
+                pk__in=Recipe.objects.filter(
+                    author=OuterRef("author")
+                ).order_by("-id").values("pk")[:recipes_limit]
+            )
+
+        return User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch("recipes", queryset=recipes, to_attr="short_recipes")
+        ).order_by("username")
 
     @action(
         detail=True,
@@ -112,7 +224,11 @@ class UsersViewSet(
                 context={"request": request},
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_counter(
+                    User.objects.filter(pk=author.pk), "followers_count", 1
+                )
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         if request.method == "DELETE":
@@ -121,8 +237,11 @@ class UsersViewSet(
                 Follow,
                 author=author,
                 user=request.user)
-            if follow:
+            with transaction.atomic():
                 follow.delete()
+                change_counter(
+                    User.objects.filter(pk=author.pk), "followers_count", -1
+                )
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -136,7 +255,9 @@ class ObtainTokenView(views.APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(
+            data=request.data, context={"request": request}
+        )
         if serializer.is_valid(raise_exception=True):
             return Response(
                 {"token": serializer.validated_data.get("auth_token")},
@@ -163,9 +284,14 @@ class DeleteTokenView(views.APIView):
 # #####################RECIPES##########################
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(
+    CatalogConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    viewsets.ModelViewSet,
+):
     """Вьюсет для модели Tag"""
 
+    cache_namespace = "tags"
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
@@ -173,35 +299,229 @@ class TagViewSet(viewsets.ModelViewSet):
 
 
 class IngredientViewSet(
+    CatalogConditionalGetMixin,
+    AnonymousResponseCacheMixin,
     generics.ListAPIView,
     generics.RetrieveAPIView,
     viewsets.GenericViewSet,
 ):
     """Вьюсет для модели Ingredient"""
 
+    cache_namespace = "ingredients"
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend]
-    search_fields = ("^name",)
 
-    def get_queryset(self):
-        return Recipe.objects.all()
+    def get_catalog_state(self):
+        if self.action == "list" and "name" in self.request.query_params:
+            count, last_modified = ingredient_index.get_state()
+            return make_etag(count, last_modified), last_modified
+        return super().get_catalog_state()
+
+    def filter_queryset(self, queryset):
+        name = self.request.query_params.get("name")
+        if self.action == "list" and name is not None:
+            return ingredient_index.search(name)
+        return super().filter_queryset(queryset)
 
 
 class RecipeViewSet(
-    generics.ListAPIView,
+    AnonymousResponseCacheMixin,
     generics.ListCreateAPIView,
-    generics.RetrieveAPIView,
+    generics.RetrieveUpdateDestroyAPIView,
     viewsets.GenericViewSet,
 ):
     """Вьюсет для модели Recipe"""
 
+    cache_namespace = "recipes"
     serializer_class = RecipesSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = LimitOffsetOrCursorPagination
     filter_backends = [DjangoFilterBackend]
+    filterset_class = RecipeFilter
 
     def get_queryset(self):
-        return Recipe.objects.all()
+        user = self.request.user
+        return Recipe.objects.with_user_flags(user).with_related(user)
+
+    def get_retrieve_state(self, pk):
+        """
+        Версия рецепта для условного GET: время изменения
+        и пользовательские флаги, без загрузки связанных объектов.
+        """
+        user = self.request.user
+        queryset = Recipe.objects.with_user_flags(user).filter(pk=pk)
+        fields = ["updated_at", "is_favorited", "is_in_shopping_cart"]
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user=user, author=OuterRef("author")
+                    )
+                )
+            )
+            fields.append("is_subscribed")
+        return queryset.values(*fields).first()
+
+    def retrieve(self, request, *args, **kwargs):
+        state = self.get_retrieve_state(kwargs["pk"])
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = make_etag(request.user.pk, *state.values())
+        self.response_etag = etag
+        last_modified = None
+        if not request.user.is_authenticated:
+            last_modified = state["updated_at"]
+        return conditional_response(
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            etag,
+            last_modified,
+        )
+
+    def reload_instance(self, serializer):
+        """
+        Перечитывает сохраненный рецепт с аннотациями и предзагрузкой,
+        чтобы ответ сериализовался фиксированным числом запросов.
+        """
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+        change_counter(
+            User.objects.filter(pk=self.request.user.pk), "recipes_count", 1
+        )
+        self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload_instance(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        shopping_list.remove_recipe(instance.pk)
+        with sync.collect_removals():
+            instance.delete()
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", -1
+        )
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="feed",
+        permission_classes=[IsAuthenticated],
+        pagination_class=IdCursorPagination,
+    )
+    def feed(self, request):
+        recipes = self.filter_queryset(self.get_queryset())
+        position, newer, limit = self.paginator.get_window(request)
+        queryset = recipes.filter(
+            pk__in=feed_recipe_ids(
+                request.user, recipes, limit, position, newer
+            )
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="popular",
+        pagination_class=None,
+    )
+    def popular(self, request):
+        return self.get_cached_response(self.list_popular, request)
+
+    def list_popular(self, request):
+        """
+        Топ рецептов за период ?period=week|month|all
+        по предрассчитанной дневной статистике.
+        """
+        period = request.query_params.get("period", "week")
+        if period not in PERIODS:
+            raise exceptions.ValidationError(
+                {"period": "Поддерживаются периоды: week, month, all."}
+            )
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise exceptions.ValidationError(
+                {"limit": "Ожидается целое число."}
+            )
+        if not 0 < limit <= MAX_LIMIT:
+            raise exceptions.ValidationError(
+                {"limit": f"Ожидается число от 1 до {MAX_LIMIT}."}
+            )
+
+        ids = popular_recipe_ids(period, limit)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="what_can_i_cook",
+        pagination_class=None,
+    )
+    def what_can_i_cook(self, request):
+        return self.get_cached_response(self.list_cookable, request)
+
+    def list_cookable(self, request):
+        """
+        Рецепты по доле ингредиентов, которые есть у пользователя:
+        ?ingredients=1,2,3&min_coverage=0.5&limit=20.
+        """
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist("ingredients")
+                for value in values.split(",") if value
+            }
+            min_coverage = float(
+                request.query_params.get("min_coverage", 0)
+            )
+            limit = int(request.query_params.get("limit", COOKABLE_LIMIT))
+        except ValueError:
+            raise exceptions.ValidationError(
+                "Ожидаются числовые значения параметров."
+            )
+        if not 0 < len(ingredient_ids) <= COOKABLE_MAX_INGREDIENTS:
+            raise exceptions.ValidationError({
+                "ingredients": "Укажите от 1 до "
+                f"{COOKABLE_MAX_INGREDIENTS} ингредиентов."
+            })
+        if not 0 < limit <= MAX_LIMIT:
+            raise exceptions.ValidationError(
+                {"limit": f"Ожидается число от 1 до {MAX_LIMIT}."}
+            )
+
+        matches = cookable_index.search(ingredient_ids, limit, min_coverage)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in matches]
+        )
+        missing = [pk for pk, _ in matches if pk not in recipes]
+        if missing:
+            cookable_index.discard(missing)
+
+        matches = [
+            (recipes[recipe_id], coverage)
+            for recipe_id, coverage in matches if recipe_id in recipes
+        ]
+        data = self.get_serializer(
+            [recipe for recipe, _ in matches], many=True
+        ).data
+        for item, (_, coverage) in zip(data, matches):
+            item["coverage"] = round(coverage, 2)
+        return Response(data)
 
     @action(
         detail=True,
@@ -220,7 +540,11 @@ class RecipeViewSet(
                 context={"request": request},
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_counter(
+                    Recipe.objects.filter(pk=recipe.pk), "favorites_count", 1
+                )
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         if request.method == "DELETE":
@@ -229,8 +553,11 @@ class RecipeViewSet(
                 Favorite,
                 recipe=recipe,
                 user=request.user)
-            if fav:
+            with transaction.atomic():
                 fav.delete()
+                change_counter(
+                    Recipe.objects.filter(pk=recipe.pk), "favorites_count", -1
+                )
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -253,7 +580,14 @@ class RecipeViewSet(
                 context={"request": request},
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_counter(
+                    Recipe.objects.filter(pk=recipe.pk),
+                    "shopping_cart_count",
+                    1,
+                )
+                shopping_list.add_recipes(request.user.pk, [recipe.pk])
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         if request.method == "DELETE":
@@ -262,13 +596,131 @@ class RecipeViewSet(
                 ShoppingCart,
                 recipe=recipe,
                 user=request.user)
-            if shoppingcart:
+            with transaction.atomic():
                 shoppingcart.delete()
+                change_counter(
+                    Recipe.objects.filter(pk=recipe.pk),
+                    "shopping_cart_count",
+                    -1,
+                )
+                shopping_list.remove_recipes(request.user.pk, [recipe.pk])
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        url_path="bulk_favorite",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_favorite(self, request):
+        return self.change_selection_bulk(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        url_path="bulk_shopping_cart",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_shopping_cart(self, request):
+        return self.change_selection_bulk(request, ShoppingCart)
+
+    def change_selection_bulk(self, request, model):
+        """
+        Добавляет (POST) или удаляет (DELETE) пачку рецептов
+        {"recipes": [id, ...]} в избранном или списке покупок.
+        Возвращает статус по каждому id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+
+        selected = dict(
+            Recipe.objects.filter(pk__in=recipe_ids).annotate(
+                selected=Exists(model.objects.filter(
+                    user=request.user, recipe=OuterRef("pk")
+                ))
+            ).values_list("pk", "selected")
+        )
+        adding = request.method == "POST"
+        changed = [
+            pk for pk in recipe_ids
+            if pk in selected and selected[pk] != adding
+        ]
+        with transaction.atomic():
+            if adding:
+                model.objects.bulk_create(
+                    [model(user=request.user, recipe_id=pk) for pk in changed],
+                    ignore_conflicts=True,
+                )
+                kind, _ = sync.MODEL_SOURCES[model]
+                sync.clear_removals(kind, request.user.pk, changed)
+            else:
+                with sync.collect_removals():
+                    model.objects.filter(
+                        user=request.user, recipe_id__in=changed
+                    ).delete()
+            if changed:
+                recount_recipes(Recipe.objects.filter(pk__in=changed))
+            if changed and model is ShoppingCart:
+                update_list = (
+                    shopping_list.add_recipes if adding
+                    else shopping_list.remove_recipes
+                )
+                update_list(request.user.pk, changed)
+
+        statuses = BULK_STATUSES[request.method]
+        changed = set(changed)
+        results = []
+        for pk in recipe_ids:
+            if pk not in selected:
+                result = "not_found"
+            elif pk in changed:
+                result = statuses[0]
+            else:
+                result = statuses[1]
+            results.append({"id": pk, "status": result})
+        return Response({"results": results})
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="shopping_list",
+        permission_classes=[IsAuthenticated],
+        pagination_class=None,
+    )
+    def list_shopping_items(self, request):
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related("ingredient").order_by(
+            "ingredient__name", "ingredient__measurement_unit"
+        )
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
+    def get_pdf_response(self, request):
+        """
+        PDF из дискового кэша или из пула рендеринга.
+        Пока файл готовится, отвечает 202 с Retry-After.
+        """
+        try:
+            path = shopping_pdf.get_pdf(list(get_shopping_list(request.user)))
+        except shopping_pdf.PdfUnavailable:
+            return Response(
+                {"detail": "Формат pdf временно недоступен."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        except shopping_pdf.PdfBusy:
+            path = None
+        if path is None:
+            return Response(
+                {"detail": "Файл готовится, повторите запрос."},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "1"},
+            )
+        return shopping_pdf.pdf_response(path)
+
     @action(
         detail=False,
         methods=["GET"],
@@ -276,18 +728,26 @@ class RecipeViewSet(
         permission_classes=[IsAuthenticated],
     )
     def download_shopping_cart(self, request, format=None):
+        file_format = request.query_params.get("file_format", "txt")
+        if file_format not in SHOPPING_CART_FORMATS:
+            raise exceptions.ValidationError(
+                {"file_format": "Поддерживаются форматы: txt, csv, pdf."}
+            )
 
-        filename = f"foodgram__{request.user.username}_shopping_cart.txt"
-
-        shopping_cart = ShoppingCart.objects.filter(user=request.user).all()
-        # shopping_cart_serializer = ShoppingCartSerializer(shopping_cart)
-
-        response = HttpResponse(
-            shopping_cart,
-            content_type="text/plain; charset=UTF-8"
+        filename = (
+            f"foodgram_{request.user.username}_shopping_cart.{file_format}"
         )
+        if file_format == "pdf":
+            response = self.get_pdf_response(request)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        else:
+            response = StreamingHttpResponse(
+                stream_shopping_list(request.user, file_format),
+                content_type=SHOPPING_CART_FORMATS[file_format],
+            )
         response["Content-Disposition"] = (
-            f"attachment;  filename={0}'.{filename}"
+            f'attachment; filename="{filename}"'
         )
 
         return response
@@ -18,15 +18,19 @@ SECRET_KEY = os.getenv(
     default="4v!n+uoaltujbl3f^j&n_ge@1ga*s=sva-62mow-h*3)310g6s"
 )
 
+# Профиль окружения: development (по умолчанию) или production.
+DJANGO_ENV = os.getenv("DJANGO_ENV", default="development")
+PRODUCTION = DJANGO_ENV == "production"
+
 # SECURITY WARNING: don"t run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DEBUG", default=str(not PRODUCTION)) == "True"
 
 ALLOWED_HOSTS = [
     "localhost",
     "127.0.0.1",
     "[::1]",
     "testserver",
-]
+] + os.getenv("ALLOWED_HOSTS", default="").split()
 
 
 # Application definition
@@ -62,7 +66,7 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
+        "APP_DIRS": not PRODUCTION,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -74,41 +78,88 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        (
+            "django.template.loaders.cached.Loader",
+            [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        ),
+    ]
+
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-"""
-DATABASES = {
-    "default": {
-        "ENGINE": os.getenv(
-            "DB_ENGINE",
-            default="django.db.backends.postgresql"
-        ),
-        "NAME": os.getenv("DB_NAME", default="postgres"),
-        "USER": os.getenv("POSTGRES_USER", default="postgres"),
-        "PASSWORD": os.getenv("POSTGRES_PASSWORD", default="db"),
-        "HOST": os.getenv("DB_HOST", default="localhost"),
-        "PORT": os.getenv("DB_PORT", default="5432")
+if PRODUCTION:
+    DATABASES = {
+        "default": {
+            "ENGINE": os.getenv(
+                "DB_ENGINE",
+                default="django.db.backends.postgresql"
+            ),
+            "NAME": os.getenv("DB_NAME", default="postgres"),
+            "USER": os.getenv("POSTGRES_USER", default="postgres"),
+            "PASSWORD": os.getenv("POSTGRES_PASSWORD", default="db"),
+            "HOST": os.getenv("DB_HOST", default="localhost"),
+            "PORT": os.getenv("DB_PORT", default="5432"),
+            # Постоянные соединения вместо подключения на каждый запрос.
+            "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", default=600)),
+            # В Django 3.2 проверку выполняет api.db.request_health_checks.
+            "CONN_HEALTH_CHECKS": True,
+        }
     }
-}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        }
+    }
+
 
-"""
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# В production кэш общий для всех воркеров: версии кэша ответов
+# и сессии должны быть видны каждому процессу.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default=(
+                "django.core.cache.backends.memcached.PyMemcacheCache"
+                if PRODUCTION
+                else "django.core.cache.backends.locmem.LocMemCache"
+            ),
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            default="memcached:11211" if PRODUCTION else "foodgram",
+        ),
     }
 }
 
+if PRODUCTION:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", default=600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
 AUTH_USER_MODEL = "users.User"
 
+AUTHENTICATION_BACKENDS = [
+    "users.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -155,7 +206,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 6,
@@ -164,4 +215,41 @@ REST_FRAMEWORK = {
     ],
 }
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", default=10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", default=60))
+
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", default=1000))
+
+POPULAR_ROLLUP_LAG = int(os.getenv("POPULAR_ROLLUP_LAG", default=60))
+
+SEARCH_RESULTS_LIMIT = int(os.getenv("SEARCH_RESULTS_LIMIT", default=200))
+
+COOKABLE_INDEX_REFRESH = int(os.getenv("COOKABLE_INDEX_REFRESH", default=5))
+COOKABLE_INDEX_TTL = int(os.getenv("COOKABLE_INDEX_TTL", default=3600))
+
+SYNC_OVERLAP = int(os.getenv("SYNC_OVERLAP", default=60))
+SYNC_TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", default=30))
+
+SHOPPING_LIST_CACHE_DIR = os.getenv(
+    "SHOPPING_LIST_CACHE_DIR",
+    default=os.path.join(BASE_DIR, "cache", "shopping_lists"),
+)
+SHOPPING_LIST_ACCEL_PREFIX = os.getenv("SHOPPING_LIST_ACCEL_PREFIX", default="")
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+SHOPPING_LIST_CACHE_MAX_AGE_DAYS = float(
+    os.getenv("SHOPPING_LIST_CACHE_MAX_AGE_DAYS", default=7)
+)
+SHOPPING_LIST_CACHE_MAX_SIZE_MB = int(
+    os.getenv("SHOPPING_LIST_CACHE_MAX_SIZE_MB", default=512)
+)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", default=2))
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", default=32))
+PDF_RENDER_WAIT = float(os.getenv("PDF_RENDER_WAIT", default=2))
+
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", default="False") == "True"
+ASYNC_VIEW_THREADS = int(os.getenv("ASYNC_VIEW_THREADS", default=4))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
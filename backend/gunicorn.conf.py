@@ -0,0 +1,47 @@
+"""
+Настройки gunicorn.
+
+SERVER_MODE=wsgi (по умолчанию) — воркеры gthread с потоками,
+SERVER_MODE=asgi — воркеры uvicorn и асинхронные читающие эндпоинты.
+
+Каждый поток держит постоянное соединение с PostgreSQL (CONN_MAX_AGE),
+поэтому workers * (потоков на воркер + 1) должно оставаться меньше
+max_connections базы (POSTGRES_MAX_CONNECTIONS, по умолчанию 100).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0:8000")
+workers = int(
+    os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = timeout
+# Перезапуск воркера теряет очередь фоновой обработки картинок:
+# ее добирает process_recipe_images --min-age по расписанию.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    worker_threads = int(os.getenv("ASYNC_VIEW_THREADS", 4))
+else:
+    wsgi_app = "foodgram.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+    worker_threads = threads
+
+max_connections = int(os.getenv("POSTGRES_MAX_CONNECTIONS", 100))
+
+
+def on_starting(server):
+    connections = workers * (worker_threads + 1)
+    if connections >= max_connections:
+        server.log.warning(
+            "Воркеры могут открыть до %s соединений с БД при "
+            "max_connections=%s: уменьшите GUNICORN_WORKERS или число "
+            "потоков.",
+            connections,
+            max_connections,
+        )
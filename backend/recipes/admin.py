@@ -1,8 +1,10 @@
 from django.contrib import admin
 
+from . import shopping_list
 from .models import (Tag, Ingredient, RecipeIngredient,
                      Recipe, ShoppingCart, Favorite
                      )
+from .search import search_recipe_ids
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -51,6 +53,39 @@ class RecipeAdminPanel(admin.ModelAdmin):
     list_filter = ("name", )
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо ILIKE по названию."""
+        recipe_ids = search_recipe_ids(search_term) if search_term else None
+        if recipe_ids is None:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=recipe_ids), False
+
+    # Списки покупок (ShoppingListItem) ведутся теми же функциями,
+    # что и в API: изменения состава и удаление рецепта.
+
+    def save_related(self, request, form, formsets, change):
+        recipe_id = form.instance.pk
+        before = shopping_list.recipe_amounts([recipe_id]) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.change_recipe(
+                recipe_id,
+                shopping_list.amount_changes(
+                    before, shopping_list.recipe_amounts([recipe_id])
+                ),
+            )
+
+    def delete_model(self, request, obj):
+        shopping_list.remove_recipe(obj.pk)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for recipe_id in queryset.values_list("pk", flat=True):
+            shopping_list.remove_recipe(recipe_id)
+        super().delete_queryset(request, queryset)
+
 
 class ShoppingCartAdminPanel(admin.ModelAdmin):
     """
@@ -62,6 +97,24 @@ class ShoppingCartAdminPanel(admin.ModelAdmin):
     list_filter = ("user", )
     empty_value_display = "-пусто-"
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            previous = ShoppingCart.objects.get(pk=obj.pk)
+            shopping_list.remove_recipes(
+                previous.user_id, [previous.recipe_id]
+            )
+        super().save_model(request, obj, form, change)
+        shopping_list.add_recipes(obj.user_id, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        shopping_list.remove_recipes(obj.user_id, [obj.recipe_id])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for user_id, recipe_id in queryset.values_list("user_id", "recipe_id"):
+            shopping_list.remove_recipes(user_id, [recipe_id])
+        super().delete_queryset(request, queryset)
+
 
 class FavoriteAdminPanel(admin.ModelAdmin):
     """
@@ -0,0 +1,69 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+
+def change_counter(queryset, field, delta):
+    """
+    Атомарно меняет счетчик на стороне базы данных.
+    Уменьшение не опускается ниже нуля: строка, созданная в обход API
+    (админка, фикстуры), счетчик не увеличивала.
+    """
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    return queryset.update(**{field: value})
+
+
+def count_subquery(queryset, field):
+    """Число строк queryset, связанных с внешней строкой через field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+RECIPE_COUNTERS = {
+    "favorites_count": (Favorite.objects.all(), "recipe"),
+    "shopping_cart_count": (ShoppingCart.objects.all(), "recipe"),
+}
+USER_COUNTERS = {
+    "recipes_count": (Recipe.objects.all(), "author"),
+    "followers_count": (Follow.objects.all(), "author"),
+}
+
+
+def recount(queryset, counters):
+    """
+    Пересчитывает счетчики и исправляет только разошедшиеся строки.
+    Возвращает число исправленных строк.
+    """
+    actual = {
+        field: count_subquery(related, lookup)
+        for field, (related, lookup) in counters.items()
+    }
+    drifted = Q()
+    for field, expression in actual.items():
+        drifted |= ~Q(**{field: expression})
+    return queryset.filter(drifted).update(**actual)
+
+
+def recount_recipes(queryset=None):
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return recount(queryset, RECIPE_COUNTERS)
+
+
+def recount_users(queryset=None):
+    if queryset is None:
+        queryset = User.objects.all()
+    return recount(queryset, USER_COUNTERS)
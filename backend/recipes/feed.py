@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import Follow, User
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def get_fanout_limit():
+    return getattr(settings, "FEED_FANOUT_LIMIT", 1000)
+
+
+def add_entries(pairs):
+    """Создает записи лент пачками, пропуская уже существующие."""
+    batch = []
+    for user_id, recipe_id in pairs:
+        batch.append(TimelineEntry(user_id=user_id, recipe_id=recipe_id))
+        if len(batch) == FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def lock_author(author_id):
+    """
+    Упорядочивает рассылку рецептов автора и новые подписки на него:
+    подписка либо попадает в список подписчиков рассылки, либо видит
+    рецепт уже разосланным и копирует его в backfill_follow.
+    """
+    list(User.objects.select_for_update().filter(pk=author_id).values("pk"))
+
+
+@transaction.atomic
+def fan_out_recipe(recipe_id, author_id):
+    """
+    Записывает новый рецепт в ленты подписчиков автора.
+    Рецепты авторов с числом подписчиков больше FEED_FANOUT_LIMIT
+    не рассылаются и читаются из ленты напрямую (fan-out on read).
+    """
+    lock_author(author_id)
+    followers = Follow.objects.filter(author_id=author_id)
+    if followers.count() > get_fanout_limit():
+        return
+    Recipe.objects.filter(pk=recipe_id).update(fanned_out=True)
+    add_entries(
+        (user_id, recipe_id)
+        for user_id in followers.values_list("user_id", flat=True).iterator()
+    )
+
+
+@transaction.atomic
+def backfill_follow(user_id, author_id):
+    """Добавляет в ленту новые подписки уже разосланные рецепты автора."""
+    lock_author(author_id)
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id, fanned_out=True
+    ).values_list("pk", flat=True)
+    add_entries(
+        (user_id, recipe_id) for recipe_id in recipe_ids.iterator()
+    )
+
+
+def remove_follow(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def feed_recipe_ids(user, recipes, limit, position=None, newer=False):
+    """
+    Кандидаты на страницу ленты: не больше limit id рецептов из записей
+    TimelineEntry пользователя и столько же из неразосланных рецептов
+    его подписок, старше position (или новее при newer).
+    recipes — queryset рецептов с фильтрами запроса.
+
+    Оба источника читаются по индексам в порядке id — (user, recipe)
+    и recipe_not_fanned_out_idx, — без сортировки всей ленты.
+    """
+    bound, order = ("gt", "") if newer else ("lt", "-")
+    timeline = TimelineEntry.objects.filter(user=user).filter(
+        Exists(recipes.filter(pk=OuterRef("recipe_id")))
+    )
+    unfanned = recipes.filter(
+        fanned_out=False,
+        author__in=Follow.objects.filter(user=user).values("author_id"),
+    )
+    if position is not None:
+        timeline = timeline.filter(**{f"recipe_id__{bound}": position})
+        unfanned = unfanned.filter(**{f"pk__{bound}": position})
+    return set(
+        timeline.order_by(f"{order}recipe_id").values_list(
+            "recipe_id", flat=True
+        )[:limit]
+    ) | set(
+        unfanned.order_by(f"{order}pk").values_list("pk", flat=True)[:limit]
+    )
@@ -0,0 +1,154 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    "thumbnail": (320, 320),
+    "card": (640, 640),
+    "full": (1280, 1280),
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+variants_ready = Signal()
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "IMAGE_PROCESSING_WORKERS", 2),
+    thread_name_prefix="recipe-images",
+)
+
+
+def variant_name(source, variant, extension):
+    stem, _ = posixpath.splitext(source)
+    return f"{stem}_{variant}.{extension}"
+
+
+def render_variant(image, size, image_format, quality):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=quality, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(source):
+    """
+    Создает уменьшенные JPEG и WebP копии исходной картинки.
+    Возвращает словарь {вариант: {формат: имя файла}}.
+    """
+    with default_storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert("RGB")
+
+    formats = {"jpeg": ("JPEG", JPEG_QUALITY)}
+    if features.check("webp"):
+        formats["webp"] = ("WEBP", WEBP_QUALITY)
+
+    variants = {}
+    for variant, size in VARIANTS.items():
+        variants[variant] = {}
+        for extension, (image_format, quality) in formats.items():
+            name = variant_name(source, variant, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[variant][extension] = default_storage.save(
+                name, render_variant(image, size, image_format, quality)
+            )
+    return variants
+
+
+def delete_variants(variants):
+    for formats in variants.values():
+        if not isinstance(formats, dict):
+            continue
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def process_recipe_image(recipe_id):
+    """
+    Строит варианты картинки рецепта и сохраняет их имена
+    в Recipe.image_variants. Соединение с БД не закрывает,
+    поэтому годится и для вызова из команды.
+    """
+    from recipes.models import Recipe
+
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).only(
+            "image", "image_variants"
+        ).first()
+        if recipe is None or not recipe.image:
+            return
+        source = recipe.image.name
+        if recipe.image_variants.get("source") == source:
+            return
+
+        variants = build_variants(source)
+        variants["source"] = source
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=source
+        ).update(image_variants=variants, updated_at=timezone.now())
+        if not updated:
+            delete_variants(variants)
+            return
+        previous = recipe.image_variants
+        if previous.get("source") not in (None, source):
+            delete_variants(previous)
+        variants_ready.send(sender=Recipe, recipe_id=recipe_id)
+    except Exception:
+        logger.exception(
+            "Не удалось обработать картинку рецепта %s", recipe_id
+        )
+
+
+def process_recipe_image_task(recipe_id):
+    """
+    Задача для пула: у потоков пула свое соединение с БД,
+    которое закрывается после каждой задачи.
+    """
+    close_old_connections()
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_recipe_image(recipe):
+    """
+    Ставит обработку картинки в пул после фиксации транзакции,
+    чтобы не задерживать поток запроса. Очередь живет в памяти
+    процесса: задачи, потерянные при перезапуске воркера, подбирает
+    команда process_recipe_images по несовпадению image_variants["source"].
+    """
+    if not recipe.image:
+        return
+    if recipe.image_variants.get("source") == recipe.image.name:
+        return
+    recipe_id = recipe.pk
+    transaction.on_commit(
+        lambda: executor.submit(process_recipe_image_task, recipe_id)
+    )
+
+
+def get_variant(recipe, variant, extension="jpeg"):
+    """
+    Имя файла нужного варианта или исходной картинки,
+    если варианты еще не готовы.
+    """
+    variants = recipe.image_variants or {}
+    if variants.get("source") == recipe.image.name:
+        name = variants.get(variant, {}).get(extension)
+        if name:
+            return name
+    return recipe.image.name
@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-18 19:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsRollupState',
+            fields=[
+                ('source', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='источник')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='последний id')),
+            ],
+            options={
+                'verbose_name': 'Состояние агрегации',
+                'verbose_name_plural': 'Состояния агрегации',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='добавлено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='добавлено'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='дата')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='в избранном')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='в списке покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='recipes.recipe', verbose_name='рецепт')),
+            ],
+            options={
+                'verbose_name': 'Статистика рецепта за день',
+                'verbose_name_plural': 'Статистика рецептов по дням',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipedailystats',
+            index=models.Index(fields=['date', 'recipe'], name='recipe_daily_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipedailystats',
+            constraint=models.UniqueConstraint(fields=('recipe', 'date'), name='unique_recipe_daily_stats'),
+        ),
+    ]
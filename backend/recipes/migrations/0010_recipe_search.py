@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from recipes.search import create_table, drop_table, index_recipes
+
+
+def create_search_index(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    create_table(schema_editor)
+    index_recipes(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True),
+        Recipe,
+        RecipeIngredient,
+        db=schema_editor.connection,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    drop_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_popular_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
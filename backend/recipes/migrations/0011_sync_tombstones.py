@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('favorite', 'избранное'), ('shopping_cart', 'список покупок'), ('follow', 'подписка')], max_length=16, verbose_name='тип')),
+                ('object_id', models.BigIntegerField(verbose_name='id рецепта или автора')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='удалено')),
+            ],
+            options={
+                'verbose_name': 'Отметка об удалении',
+                'verbose_name_plural': 'Отметки об удалении',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'created'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', 'created'], name='shoppingcart_user_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='sync_tombstone_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='synctombstone',
+            constraint=models.UniqueConstraint(fields=('user', 'kind', 'object_id'), name='unique_sync_tombstone'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.core import validators
 from django.db import models
 
-from users.models import User
+from users.models import Follow, User
 
 
 class Tag(models.Model):
@@ -12,6 +12,7 @@ class Tag(models.Model):
     name = models.CharField("название тега", max_length=150, )
     color = models.CharField("цветовой код", max_length=7, )
     slug = models.SlugField("слаг тега", max_length=150, unique=True, )
+    updated_at = models.DateTimeField("изменен", auto_now=True, )
 
     class Meta:
         verbose_name = "Тег"
@@ -29,16 +30,84 @@ class Ingredient(models.Model):
 
     name = models.CharField("название ингредиента", max_length=250, )
     measurement_unit = models.CharField("единицы измерения", max_length=250, )
+    updated_at = models.DateTimeField("изменен", auto_now=True, )
 
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient_unit_pair",
+            )
+        ]
 
     def __str__(self):
         return f"Ингредиент {self.name}"
 
 
+class RecipeQuerySet(models.QuerySet):
+    """
+    QuerySet рецептов с пользовательскими аннотациями.
+    """
+
+    def with_user_flags(self, user):
+        """
+        Добавляет флаги is_favorited и is_in_shopping_cart
+        для пользователя одним запросом вместе с рецептами.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+        )
+
+    def with_related(self, user):
+        """
+        План загрузки связанных объектов для сериализации рецептов:
+        автор с флагом is_subscribed, теги и ингредиенты.
+        Количество запросов не зависит от размера страницы.
+        """
+        authors = User.objects.all()
+        if user.is_authenticated:
+            authors = authors.annotate(
+                is_subscribed=models.Exists(
+                    Follow.objects.filter(
+                        user=user, author=models.OuterRef("pk")
+                    )
+                )
+            )
+
+        return self.prefetch_related(
+            models.Prefetch("author", queryset=authors),
+            "tags",
+            models.Prefetch(
+                "recipe_ingr",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+
+
 class Recipe(models.Model):
     """
     Модель рецептов.
@@ -53,6 +122,12 @@ class Recipe(models.Model):
         upload_to="media/recipes/",
         blank=True
     )
+    image_variants = models.JSONField(
+        "варианты картинки",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     name = models.CharField("название рецепта", max_length=250, )
     text = models.TextField("описание рецепта", )
     author = models.ForeignKey(
@@ -69,11 +144,47 @@ class Recipe(models.Model):
             ),
         ],
     )
+    updated_at = models.DateTimeField(
+        "изменен",
+        auto_now=True,
+        help_text="Меняется и при изменении ингредиентов и тегов рецепта.",
+    )
+    favorites_count = models.PositiveIntegerField(
+        "в избранном",
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        "в списках покупок",
+        default=0,
+        editable=False,
+    )
+    fanned_out = models.BooleanField(
+        "разослан в ленты",
+        default=False,
+        editable=False,
+        help_text="Рецепт записан в ленты подписчиков (TimelineEntry).",
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["name"]
+        indexes = [
+            models.Index(
+                fields=["author", "-id"], name="recipe_author_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-id"],
+                condition=models.Q(fanned_out=False),
+                name="recipe_not_fanned_out_idx",
+            ),
+            models.Index(
+                fields=["updated_at"], name="recipe_updated_at_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Рецепт {self.name} под авторством {self.author}"
@@ -132,6 +243,7 @@ class Favorite(models.Model):
         related_name="favorites",
         verbose_name="рецепт",
     )
+    created = models.DateTimeField("добавлено", auto_now_add=True, )
 
     class Meta:
         constraints = [
@@ -139,6 +251,11 @@ class Favorite(models.Model):
                 fields=["user", "recipe"], name="unique_favorite_pair"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "created"], name="favorite_user_created_idx"
+            ),
+        ]
 
         verbose_name = "Избранный рецепт"
         verbose_name_plural = "Избранные рецепты"
@@ -165,6 +282,7 @@ class ShoppingCart(models.Model):
         related_name="shoppingcart",
         verbose_name="рецепт",
     )
+    created = models.DateTimeField("добавлено", auto_now_add=True, )
 
     class Meta:
         constraints = [
@@ -172,6 +290,12 @@ class ShoppingCart(models.Model):
                 fields=["user", "recipe"], name="unique_shoppingcart_pair"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "created"],
+                name="shoppingcart_user_created_idx",
+            ),
+        ]
 
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
@@ -179,3 +303,167 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"Список покупок {self.user}"
+
+
+class ShoppingListItem(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+    Поддерживается при изменении корзины и состава рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        verbose_name="пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="ингредиент",
+    )
+    amount = models.IntegerField("количество", default=0, )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_shopping_list_item",
+            )
+        ]
+        verbose_name = "Строка списка покупок"
+        verbose_name_plural = "Строки списков покупок"
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} {self.amount}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись ленты пользователя: рецепт автора, на которого он подписан.
+    Заполняется при публикации рецепта (fan-out on write).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="пользователь",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="рецепт",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_timeline_entry"
+            )
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+
+    def __str__(self):
+        return f"Лента {self.user}: {self.recipe}"
+
+
+class RecipeDailyStats(models.Model):
+    """
+    Число добавлений рецепта в избранное и в список покупок за день.
+    Заполняется командой rollup_popular из Favorite и ShoppingCart.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name="рецепт",
+    )
+    date = models.DateField("дата", )
+    favorites = models.PositiveIntegerField("в избранном", default=0, )
+    shopping_carts = models.PositiveIntegerField(
+        "в списке покупок", default=0,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "date"], name="unique_recipe_daily_stats"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["date", "recipe"], name="recipe_daily_stats_date_idx"
+            ),
+        ]
+        verbose_name = "Статистика рецепта за день"
+        verbose_name_plural = "Статистика рецептов по дням"
+
+    def __str__(self):
+        return f"{self.recipe} за {self.date}"
+
+
+class StatsRollupState(models.Model):
+    """
+    Последний учтенный первичный ключ источника статистики.
+    """
+
+    source = models.CharField("источник", max_length=32, primary_key=True, )
+    last_id = models.BigIntegerField("последний id", default=0, )
+
+    class Meta:
+        verbose_name = "Состояние агрегации"
+        verbose_name_plural = "Состояния агрегации"
+
+    def __str__(self):
+        return f"{self.source}: {self.last_id}"
+
+
+class SyncTombstone(models.Model):
+    """
+    Отметка об удалении из избранного, списка покупок или подписок
+    для синхронизации клиентов. Удаляется при повторном добавлении.
+    """
+
+    FAVORITE = "favorite"
+    SHOPPING_CART = "shopping_cart"
+    FOLLOW = "follow"
+    KINDS = (
+        (FAVORITE, "избранное"),
+        (SHOPPING_CART, "список покупок"),
+        (FOLLOW, "подписка"),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="пользователь",
+    )
+    kind = models.CharField("тип", max_length=16, choices=KINDS, )
+    object_id = models.BigIntegerField("id рецепта или автора", )
+    deleted_at = models.DateTimeField("удалено", auto_now_add=True, )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "kind", "object_id"],
+                name="unique_sync_tombstone",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at"],
+                name="sync_tombstone_user_idx",
+            ),
+        ]
+        verbose_name = "Отметка об удалении"
+        verbose_name_plural = "Отметки об удалении"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.kind} {self.object_id}"
@@ -0,0 +1,37 @@
+import threading
+
+from django.db import connection, transaction
+
+
+class PendingIds:
+    """
+    Идентификаторы, накопленные за транзакцию, которые обрабатываются
+    одним вызовом handler после ее фиксации.
+
+    Набор принадлежит транзакции, в которой зарегистрирован flush:
+    если регистрации уже нет среди on_commit-функций соединения
+    (транзакция откатилась) или flush уже отработал, старые
+    идентификаторы отбрасываются.
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
+        self._local = threading.local()
+
+    def add(self, ids):
+        entry = getattr(self._local, "entry", None)
+        if entry is not None and entry in connection.run_on_commit:
+            self._local.ids.update(ids)
+            return
+        self._local.ids = set(ids)
+        self._local.entry = None
+        transaction.on_commit(self.flush)
+        if connection.in_atomic_block:
+            self._local.entry = connection.run_on_commit[-1]
+
+    def flush(self):
+        ids = getattr(self._local, "ids", None)
+        self._local.ids = set()
+        self._local.entry = None
+        if ids:
+            self._handler(ids)
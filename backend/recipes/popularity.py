@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes.models import (
+    Favorite,
+    RecipeDailyStats,
+    ShoppingCart,
+    StatsRollupState,
+)
+
+SOURCES = {
+    "favorites": Favorite,
+    "shopping_carts": ShoppingCart,
+}
+PERIODS = {
+    "week": 7,
+    "month": 30,
+    "all": None,
+}
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def get_rollup_lag():
+    """
+    Строки моложе этого интервала откладываются до следующего запуска,
+    чтобы не пропустить меньшие id из еще не зафиксированных транзакций.
+    """
+    return timedelta(seconds=getattr(settings, "POPULAR_ROLLUP_LAG", 60))
+
+
+def merge_counts(field, counts):
+    """
+    Прибавляет {(recipe_id, date): число} к дневной статистике:
+    существующие строки увеличиваются через F(), новые создаются.
+    """
+    existing = RecipeDailyStats.objects.filter(
+        recipe_id__in={recipe_id for recipe_id, _ in counts},
+        date__in={date for _, date in counts},
+    ).only("pk", "recipe_id", "date")
+    updated = []
+    for stats in existing:
+        total = counts.pop((stats.recipe_id, stats.date), None)
+        if total is not None:
+            setattr(stats, field, F(field) + total)
+            updated.append(stats)
+    RecipeDailyStats.objects.bulk_update(updated, [field])
+    RecipeDailyStats.objects.bulk_create(
+        RecipeDailyStats(recipe_id=recipe_id, date=date, **{field: total})
+        for (recipe_id, date), total in counts.items()
+    )
+
+
+def rollup_batch(field, state, cutoff, batch_size):
+    """
+    Переносит в статистику очередную пачку строк источника,
+    останавливаясь на первой строке моложе cutoff.
+    Возвращает число учтенных строк.
+    """
+    model = SOURCES[field]
+    new_rows = model.objects.filter(pk__gt=state.last_id)
+    window = new_rows.order_by("pk").values_list("pk", "created")
+    last_id = None
+    processed = 0
+    for pk, created in window[:batch_size]:
+        if created >= cutoff:
+            break
+        last_id = pk
+        processed += 1
+    if last_id is None:
+        return 0
+
+    rows = (
+        new_rows.filter(pk__lte=last_id)
+        .annotate(date=TruncDate("created"))
+        .order_by()
+        .values("recipe_id", "date")
+        .annotate(total=Count("pk"))
+    )
+    merge_counts(
+        field,
+        {(row["recipe_id"], row["date"]): row["total"] for row in rows},
+    )
+    state.last_id = last_id
+    state.save(update_fields=["last_id"])
+    return processed
+
+
+def rollup(batch_size=5000):
+    """
+    Инкрементально агрегирует новые строки Favorite и ShoppingCart
+    в RecipeDailyStats. Удаления не учитываются: рейтинг строится
+    по числу добавлений за период.
+    Возвращает {источник: число учтенных строк}.
+    """
+    StatsRollupState.objects.bulk_create(
+        [StatsRollupState(source=field) for field in SOURCES],
+        ignore_conflicts=True,
+    )
+    cutoff = timezone.now() - get_rollup_lag()
+    processed = dict.fromkeys(SOURCES, 0)
+    for field in SOURCES:
+        while True:
+            with transaction.atomic():
+                # Блокируются все источники: строки статистики общие.
+                states = {
+                    state.source: state
+                    for state in StatsRollupState.objects
+                    .select_for_update().order_by("source")
+                }
+                count = rollup_batch(
+                    field, states[field], cutoff, batch_size
+                )
+            if not count:
+                break
+            processed[field] += count
+    return processed
+
+
+def popular_recipe_ids(period, limit):
+    """
+    Идентификаторы самых популярных рецептов за период
+    по сумме добавлений в избранное и в список покупок.
+    """
+    stats = RecipeDailyStats.objects.all()
+    days = PERIODS[period]
+    if days is not None:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        stats = stats.filter(date__gte=since)
+    return list(
+        stats.values("recipe_id")
+        .annotate(score=Sum(F("favorites") + F("shopping_carts")))
+        .order_by("-score", "-recipe_id")
+        .values_list("recipe_id", flat=True)[:limit]
+    )
@@ -0,0 +1,224 @@
+"""
+Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+Документы хранятся в отдельной таблице recipes_recipe_search:
+на PostgreSQL это tsvector со словарем russian и GIN-индексом,
+на SQLite — виртуальная таблица FTS5 с основами слов,
+полученными стеммером recipes.stemmer.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from recipes.pending import PendingIds
+from recipes.stemmer import stem_words
+
+TABLE = "recipes_recipe_search"
+INDEX_BATCH_SIZE = 1000
+
+
+def get_results_limit():
+    return getattr(settings, "SEARCH_RESULTS_LIMIT", 200)
+
+
+class PostgresSearchBackend:
+    """tsvector с весами A (название), B (ингредиенты), C (описание)."""
+
+    key = "recipe_id"
+    create_sql = (
+        f"CREATE TABLE {TABLE} ("
+        "recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) "
+        "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "document tsvector NOT NULL)",
+        f"CREATE INDEX {TABLE}_document_idx ON {TABLE} "
+        "USING gin (document)",
+    )
+    drop_sql = (f"DROP TABLE IF EXISTS {TABLE}",)
+    upsert_sql = (
+        f"INSERT INTO {TABLE} (recipe_id, document) VALUES (%s, "
+        "setweight(to_tsvector('russian', %s), 'A') || "
+        "setweight(to_tsvector('russian', %s), 'B') || "
+        "setweight(to_tsvector('russian', %s), 'C')) "
+        "ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document"
+    )
+    search_sql = (
+        f"SELECT recipe_id FROM {TABLE}, "
+        "plainto_tsquery('russian', %s) AS query "
+        "WHERE document @@ query "
+        "ORDER BY ts_rank(document, query) DESC, recipe_id DESC LIMIT %s"
+    )
+
+    def index(self, cursor, documents):
+        cursor.executemany(self.upsert_sql, [
+            (recipe_id, name, ingredients, text)
+            for recipe_id, name, text, ingredients in documents
+        ])
+
+    def remove(self, cursor, recipe_ids):
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE recipe_id = ANY(%s)",
+            [list(recipe_ids)],
+        )
+
+    def make_query(self, query):
+        return query
+
+    def search(self, cursor, query, limit):
+        cursor.execute(self.search_sql, [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SqliteSearchBackend:
+    """FTS5 по основам слов, ранжирование bm25 с весами колонок."""
+
+    key = "rowid"
+    create_sql = (
+        f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+        "name, ingredients, text, tokenize = 'unicode61')",
+    )
+    drop_sql = (f"DROP TABLE IF EXISTS {TABLE}",)
+    search_sql = (
+        f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+        f"ORDER BY bm25({TABLE}, 10.0, 4.0, 1.0), rowid DESC LIMIT %s"
+    )
+
+    def index(self, cursor, documents):
+        documents = list(documents)
+        self.remove(cursor, [document[0] for document in documents])
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, name, ingredients, text) "
+            "VALUES (%s, %s, %s, %s)",
+            [
+                (
+                    recipe_id,
+                    " ".join(stem_words(name)),
+                    " ".join(stem_words(ingredients)),
+                    " ".join(stem_words(text)),
+                )
+                for recipe_id, name, text, ingredients in documents
+            ],
+        )
+
+    def remove(self, cursor, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+            batch = recipe_ids[start:start + INDEX_BATCH_SIZE]
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN "
+                f"({', '.join(['%s'] * len(batch))})",
+                batch,
+            )
+
+    def make_query(self, query):
+        """Основы слов запроса как префиксы, объединенные по И."""
+        return " ".join(f'"{word}"*' for word in stem_words(query))
+
+    def search(self, cursor, query, limit):
+        cursor.execute(self.search_sql, [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SqliteSearchBackend,
+}
+
+
+def get_backend(db=None):
+    """Бэкенд для соединения или None, если поиск не поддерживается."""
+    backend_class = BACKENDS.get((db or connection).vendor)
+    return backend_class() if backend_class else None
+
+
+def create_table(schema_editor):
+    backend = get_backend(schema_editor.connection)
+    for sql in backend.create_sql if backend else ():
+        schema_editor.execute(sql)
+
+
+def drop_table(schema_editor):
+    backend = get_backend(schema_editor.connection)
+    for sql in backend.drop_sql if backend else ():
+        schema_editor.execute(sql)
+
+
+def build_documents(recipe_model, recipe_ingredient_model, recipe_ids):
+    """
+    Документы (id, название, описание, ингредиенты) для рецептов.
+    Модели передаются параметрами, чтобы работать и из миграций.
+    """
+    ingredients = defaultdict(list)
+    rows = recipe_ingredient_model.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "ingredient__name")
+    for recipe_id, name in rows:
+        ingredients[recipe_id].append(name)
+    return [
+        (recipe_id, name, text, " ".join(ingredients[recipe_id]))
+        for recipe_id, name, text in recipe_model.objects.filter(
+            pk__in=recipe_ids
+        ).values_list("pk", "name", "text")
+    ]
+
+
+def index_recipes(recipe_ids, recipe_model=None,
+                  recipe_ingredient_model=None, db=None):
+    """Переиндексирует рецепты; удаленные убирает из индекса."""
+    backend = get_backend(db)
+    if backend is None:
+        return
+    if recipe_model is None:
+        from recipes.models import Recipe, RecipeIngredient
+
+        recipe_model, recipe_ingredient_model = Recipe, RecipeIngredient
+    recipe_ids = list(recipe_ids)
+    with (db or connection).cursor() as cursor:
+        for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+            batch = recipe_ids[start:start + INDEX_BATCH_SIZE]
+            documents = build_documents(
+                recipe_model, recipe_ingredient_model, batch
+            )
+            backend.index(cursor, documents)
+            found = {document[0] for document in documents}
+            missing = [pk for pk in batch if pk not in found]
+            if missing:
+                backend.remove(cursor, missing)
+
+
+def remove_orphans():
+    """Удаляет из индекса документы рецептов, которых уже нет."""
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE {backend.key} NOT IN "
+            "(SELECT id FROM recipes_recipe)"
+        )
+        return cursor.rowcount
+
+
+_pending = PendingIds(lambda recipe_ids: index_recipes(sorted(recipe_ids)))
+
+
+def schedule_reindex(recipe_ids):
+    """
+    Переиндексирует рецепты после фиксации транзакции.
+    Повторные изменения одного рецепта в транзакции
+    схлопываются в одну переиндексацию.
+    """
+    _pending.add(recipe_ids)
+
+
+def search_recipe_ids(query, limit=None):
+    """
+    Идентификаторы рецептов по убыванию релевантности.
+    None, если база не поддерживает полнотекстовый поиск.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+    query = backend.make_query(query)
+    if not query:
+        return []
+    with connection.cursor() as cursor:
+        return backend.search(cursor, query, limit or get_results_limit())
@@ -0,0 +1,145 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+INSERT_BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_ids):
+    """Суммарное количество каждого ингредиента в рецептах."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_id", "total")
+    )
+
+
+def negate(amounts):
+    return {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    }
+
+
+def amount_changes(before, after):
+    """Изменения количеств между двумя результатами recipe_amounts()."""
+    return {
+        ingredient_id: after.get(ingredient_id, 0) - before.get(
+            ingredient_id, 0
+        )
+        for ingredient_id in before.keys() | after.keys()
+    }
+
+
+def apply_deltas(user_ids, deltas):
+    """
+    Прибавляет {ingredient_id: изменение} к спискам покупок
+    пользователей. Недостающие строки создаются, обнулившиеся удаляются.
+    user_ids — список или queryset с id пользователей.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    added = [ingredient_id for ingredient_id, delta in deltas.items()
+             if delta > 0]
+    if added:
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+                for user_id in user_ids
+                for ingredient_id in added
+            ),
+            batch_size=INSERT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(amount=F("amount") + Case(
+        *(
+            When(ingredient_id=ingredient_id, then=Value(delta))
+            for ingredient_id, delta in deltas.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    items.filter(amount__lte=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], negate(recipe_amounts(recipe_ids)))
+
+
+def change_recipe(recipe_id, deltas):
+    """Изменение состава рецепта у всех, у кого он в корзине."""
+    apply_deltas(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            "user_id", flat=True
+        ),
+        deltas,
+    )
+
+
+def remove_recipe(recipe_id):
+    """Вызывается до удаления рецепта."""
+    change_recipe(recipe_id, negate(recipe_amounts([recipe_id])))
+
+
+def compute_lists(user_ids):
+    """Списки покупок, посчитанные заново из корзин."""
+    lists = defaultdict(dict)
+    rows = (
+        RecipeIngredient.objects.filter(
+            recipe__shoppingcart__user_id__in=user_ids
+        )
+        .order_by()
+        .values("recipe__shoppingcart__user_id", "ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list(
+            "recipe__shoppingcart__user_id", "ingredient_id", "total"
+        )
+    )
+    for user_id, ingredient_id, total in rows:
+        lists[user_id][ingredient_id] = total
+    return lists
+
+
+def find_inconsistent(user_ids):
+    """Пользователи, чей сохраненный список расходится с корзиной."""
+    expected = compute_lists(user_ids)
+    actual = defaultdict(dict)
+    rows = ShoppingListItem.objects.filter(
+        user_id__in=user_ids
+    ).values_list("user_id", "ingredient_id", "amount")
+    for user_id, ingredient_id, amount in rows:
+        actual[user_id][ingredient_id] = amount
+    return [
+        user_id for user_id in user_ids
+        if expected.get(user_id, {}) != actual.get(user_id, {})
+    ]
+
+
+def rebuild(user_ids):
+    """Пересобирает списки покупок пользователей с нуля."""
+    lists = compute_lists(user_ids)
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, amounts in lists.items()
+            for ingredient_id, total in amounts.items()
+        ),
+        batch_size=INSERT_BATCH_SIZE,
+    )
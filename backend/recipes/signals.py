@@ -0,0 +1,149 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes import feed, sync
+from recipes.images import schedule_recipe_image
+from recipes.pending import PendingIds
+from recipes.search import schedule_reindex
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow, User
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    schedule_recipe_image(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        recipe_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(
+            lambda: feed.fan_out_recipe(recipe_id, author_id)
+        )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    feed.remove_follow(instance.user_id, instance.author_id)
+
+
+def touch_recipes(recipes):
+    """Обновляет updated_at рецептов, чей вывод изменился."""
+    recipes.update(updated_at=timezone.now())
+
+
+_touched = PendingIds(
+    lambda recipe_ids: touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+)
+
+
+def schedule_touch(recipe_ids):
+    """
+    Обновляет updated_at после фиксации транзакции одним UPDATE:
+    удаление ингредиентов queryset.delete() шлет сигнал на каждую строку.
+    """
+    _touched.add(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe_on_ingredients_change(sender, instance, **kwargs):
+    schedule_touch([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_on_tags_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    else:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=User)
+def touch_recipes_on_author_change(sender, instance, created,
+                                   update_fields=None, **kwargs):
+    """Профиль автора входит в ответ, а значит, и в ETag рецепта."""
+    if created:
+        return
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_recipes_on_tag_change(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_ingredient_change(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    schedule_reindex([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_recipe_on_ingredients_change(sender, instance, **kwargs):
+    schedule_reindex([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_recipes_on_ingredient_rename(sender, instance, created,
+                                         **kwargs):
+    if not created:
+        schedule_reindex(
+            RecipeIngredient.objects.filter(
+                ingredient=instance
+            ).values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def clear_sync_tombstone(sender, instance, created, **kwargs):
+    if created:
+        kind, field = sync.MODEL_SOURCES[sender]
+        sync.clear_removals(
+            kind, instance.user_id, [getattr(instance, field)]
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def record_sync_tombstone(sender, instance, **kwargs):
+    sync.removed(instance)
@@ -0,0 +1,130 @@
+"""
+Стеммер русского языка по алгоритму Snowball (Портер).
+Используется для полнотекстового поиска на SQLite, где нет
+встроенной морфологии; на PostgreSQL работает словарь russian.
+"""
+import re
+
+VOWELS = "аеиоуыэюя"
+WORD_RE = re.compile(r"\w+")
+
+PERFECTIVE_GERUND = (
+    (("в", "вши", "вшись"), True),
+    (("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"), False),
+)
+ADJECTIVE = (
+    ((
+        "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой",
+        "ем", "им", "ым", "ом", "его", "ого", "ему", "ому", "их", "ых",
+        "ую", "юю", "ая", "яя", "ою", "ею",
+    ), False),
+)
+PARTICIPLE = (
+    (("ем", "нн", "вш", "ющ", "щ"), True),
+    (("ивш", "ывш", "ующ"), False),
+)
+REFLEXIVE = (
+    (("ся", "сь"), False),
+)
+VERB = (
+    ((
+        "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но",
+        "ет", "ют", "ны", "ть", "ешь", "нно",
+    ), True),
+    ((
+        "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей",
+        "уй", "ил", "ыл", "им", "ым", "ен", "ило", "ыло", "ено", "ят",
+        "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю",
+    ), False),
+)
+NOUN = (
+    ((
+        "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи",
+        "ии", "и", "ией", "ей", "ой", "ий", "й", "иям", "ям", "ием", "ем",
+        "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью",
+        "ю", "ия", "ья", "я",
+    ), False),
+)
+SUPERLATIVE = (
+    (("ейш", "ейше"), False),
+)
+DERIVATIONAL = (
+    (("ост", "ость"), False),
+)
+
+
+def find_ending(word, groups):
+    """
+    Самое длинное окончание из групп. Окончания первой группы
+    некоторых классов допустимы только после «а» или «я».
+    """
+    best = ""
+    for endings, after_a in groups:
+        for ending in endings:
+            if len(ending) <= len(best) or not word.endswith(ending):
+                continue
+            if after_a and word[-len(ending) - 1:-len(ending)] not in "ая":
+                continue
+            if after_a and len(word) == len(ending):
+                continue
+            best = ending
+    return best
+
+
+def remove_ending(word, groups):
+    ending = find_ending(word, groups)
+    return (word[:-len(ending)], True) if ending else (word, False)
+
+
+def region_start(word, start=0):
+    """Начало области после первой согласной, следующей за гласной."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def step_one(rv):
+    rv, removed = remove_ending(rv, PERFECTIVE_GERUND)
+    if removed:
+        return rv
+    rv, _ = remove_ending(rv, REFLEXIVE)
+    rv, removed = remove_ending(rv, ADJECTIVE)
+    if removed:
+        rv, _ = remove_ending(rv, PARTICIPLE)
+        return rv
+    rv, removed = remove_ending(rv, VERB)
+    if removed:
+        return rv
+    rv, _ = remove_ending(rv, NOUN)
+    return rv
+
+
+def stem(word):
+    word = word.lower().replace("ё", "е")
+    match = re.search(f"[{VOWELS}]", word)
+    if match is None:
+        return word
+    prefix, rv = word[:match.end()], word[match.end():]
+    r2 = max(region_start(word, region_start(word)) - match.end(), 0)
+
+    rv = step_one(rv)
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    ending = find_ending(rv, DERIVATIONAL)
+    if ending and len(rv) - len(ending) >= r2:
+        rv = rv[:-len(ending)]
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        rv, removed = remove_ending(rv, SUPERLATIVE)
+        if removed and rv.endswith("нн"):
+            rv = rv[:-1]
+        elif not removed and rv.endswith("ь"):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def stem_words(text):
+    """Список основ слов текста."""
+    return [stem(word) for word in WORD_RE.findall(text or "")]
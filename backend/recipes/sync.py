@@ -0,0 +1,151 @@
+"""
+Дельта-синхронизация избранного, списка покупок и подписок.
+
+Версия — момент времени в микросекундах. Добавления читаются
+по полю created, удаления — по отметкам SyncTombstone. Окно чтения
+перекрывается на SYNC_OVERLAP секунд, чтобы не пропустить
+транзакции, зафиксированные с опозданием: клиент применяет изменения
+идемпотентно.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from recipes.models import Favorite, ShoppingCart, SyncTombstone
+from users.models import Follow
+
+SOURCES = {
+    "favorites": (Favorite, SyncTombstone.FAVORITE, "recipe_id"),
+    "shopping_cart": (ShoppingCart, SyncTombstone.SHOPPING_CART, "recipe_id"),
+    "subscriptions": (Follow, SyncTombstone.FOLLOW, "author_id"),
+}
+KIND_SOURCES = {kind: name for name, (_, kind, _) in SOURCES.items()}
+MODEL_SOURCES = {
+    model: (kind, field) for model, kind, field in SOURCES.values()
+}
+
+_collected = threading.local()
+
+
+class InvalidVersion(ValueError):
+    pass
+
+
+def get_overlap():
+    return timedelta(seconds=getattr(settings, "SYNC_OVERLAP", 60))
+
+
+def get_tombstone_ttl():
+    return timedelta(days=getattr(settings, "SYNC_TOMBSTONE_TTL_DAYS", 30))
+
+
+def encode_version(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_version(version):
+    try:
+        microseconds = int(version)
+        return datetime.fromtimestamp(
+            microseconds / 1_000_000, tz=dt_timezone.utc
+        )
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidVersion(version)
+
+
+def record_removals(kind, pairs):
+    """Отметки об удалении для пар (user_id, object_id)."""
+    SyncTombstone.objects.bulk_create(
+        [
+            SyncTombstone(user_id=user_id, kind=kind, object_id=object_id)
+            for user_id, object_id in pairs
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def clear_removals(kind, user_id, object_ids):
+    """Снимает отметки об удалении при повторном добавлении."""
+    SyncTombstone.objects.filter(
+        user_id=user_id, kind=kind, object_id__in=object_ids
+    ).delete()
+
+
+def removed(instance):
+    """
+    Отметка об удалении строки. Внутри collect_removals()
+    откладывается и записывается одним INSERT.
+    """
+    kind, field = MODEL_SOURCES[type(instance)]
+    pair = (instance.user_id, getattr(instance, field))
+    batch = getattr(_collected, "batch", None)
+    if batch is None:
+        record_removals(kind, [pair])
+    else:
+        batch.setdefault(kind, []).append(pair)
+
+
+@contextmanager
+def collect_removals():
+    """
+    Собирает отметки об удалении при массовых и каскадных удалениях.
+    Используется внутри transaction.atomic().
+    """
+    outer = getattr(_collected, "batch", None)
+    if outer is not None:
+        yield
+        return
+    _collected.batch = batch = {}
+    try:
+        yield
+    finally:
+        del _collected.batch
+    for kind, pairs in batch.items():
+        record_removals(kind, pairs)
+
+
+def get_changes(user, version=None):
+    """
+    Изменения с момента version. Без версии или для слишком старой
+    версии (отметки об удалении уже очищены) возвращает полный
+    список с флагом reset.
+    """
+    now = timezone.now()
+    since = None
+    if version is not None:
+        since = decode_version(version)
+        if since < now - get_tombstone_ttl():
+            since = None
+
+    changes = {}
+    for name, (model, _, field) in SOURCES.items():
+        rows = model.objects.filter(user=user)
+        if since is not None:
+            rows = rows.filter(created__gte=since - get_overlap())
+        changes[name] = {
+            "added": list(rows.values_list(field, flat=True)),
+            "removed": [],
+        }
+    if since is not None:
+        tombstones = SyncTombstone.objects.filter(
+            user=user, deleted_at__gte=since - get_overlap()
+        ).values_list("kind", "object_id")
+        for kind, object_id in tombstones:
+            changes[KIND_SOURCES[kind]]["removed"].append(object_id)
+
+    return {
+        "version": encode_version(now),
+        "reset": since is None,
+        **changes,
+    }
+
+
+def prune_tombstones():
+    """Удаляет отметки старше SYNC_TOMBSTONE_TTL_DAYS."""
+    deleted, _ = SyncTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - get_tombstone_ttl()
+    ).delete()
+    return deleted
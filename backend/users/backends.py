@@ -0,0 +1,35 @@
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Value
+from django.db.models.functions import Upper
+
+from users.models import User
+
+
+class EmailBackend(ModelBackend):
+    """
+    Аутентификация по email без учета регистра.
+    Пользователь и его токен читаются одним запросом
+    по функциональному индексу UPPER(email).
+    """
+
+    def get_user_by_email(self, email):
+        return (
+            User.objects.select_related("auth_token")
+            .annotate(email_upper=Upper("email"))
+            .filter(email_upper=Upper(Value(email)))
+            .order_by("pk")
+            .first()
+        )
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        user = self.get_user_by_email(email)
+        if user is None:
+            # Хэшируем пароль впустую, чтобы время ответа для
+            # несуществующего email не отличалось от неверного пароля.
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
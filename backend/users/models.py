@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Upper
 from django.forms import ValidationError
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
@@ -39,6 +40,16 @@ class User(AbstractUser):
         'пароль',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        'рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         constraints = [
@@ -47,6 +58,9 @@ class User(AbstractUser):
                 name="unique_email_username_pair",
             ),
         ]
+        indexes = [
+            models.Index(Upper("email"), name="user_email_upper_idx"),
+        ]
     verbose_name = "Пользователь"
     verbose_name_plural = "Пользователи"
     ordering = ["username", "email"]
@@ -81,6 +95,7 @@ class Follow(models.Model):
         related_name="following",
         verbose_name="Автор",
     )
+    created = models.DateTimeField("добавлено", auto_now_add=True, )
 
     class Meta:
         constraints = [
@@ -89,6 +104,11 @@ class Follow(models.Model):
                 name="unique_follow_pair",
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["user", "created"], name="follow_user_created_idx"
+            ),
+        ]
         ordering = ["-author"]
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"